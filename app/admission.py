@@ -0,0 +1,261 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException
+from starlette.routing import Match
+
+from app.principal_cache import _decode_token, principal_cache
+
+
+def _parse_limits(value: str) -> dict:
+    """Parse "GET /tasks=32,GET /tasks/export=4" into {"GET /tasks": 32, ...}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, limit = item.rpartition("=")
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+# In-flight requests per route ("METHOD /path/{template}"); 0 disables a limit
+ADMISSION_ENDPOINT_DEFAULT = int(os.getenv("ADMISSION_ENDPOINT_DEFAULT", "64"))
+ADMISSION_ENDPOINT_LIMITS = _parse_limits(os.getenv("ADMISSION_ENDPOINT_LIMITS", "GET /tasks/export=4"))
+# In-flight requests and token bucket per JWT subject
+ADMISSION_USER_INFLIGHT = int(os.getenv("ADMISSION_USER_INFLIGHT", "8"))
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "50"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "100"))
+# How long a request may queue for a slot before it is shed
+ADMISSION_MAX_QUEUE_MS = float(os.getenv("ADMISSION_MAX_QUEUE_MS", "250"))
+# Long-lived streams would hold a slot for their whole life
+ADMISSION_EXEMPT = {"GET /tasks/stream"}
+ADMISSION_MAX_SUBJECTS = 10000
+
+
+class Gate:
+    """An in-flight limit whose waiters queue in order for a bounded time.
+
+    Only touched from the event loop, so it needs no lock.
+    """
+
+    __slots__ = ("limit", "active", "waiters")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters = deque()
+
+    async def enter(self, timeout: float) -> bool:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return True
+        if timeout <= 0:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._forget(waiter)
+            return False
+        except asyncio.CancelledError:
+            # A client that went away may already have been handed a slot
+            if waiter.done() and not waiter.cancelled():
+                self.leave()
+            else:
+                self._forget(waiter)
+            raise
+
+    def _forget(self, waiter):
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def leave(self):
+        # Hand the slot straight to the next live waiter
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not self.waiters
+
+
+class TokenBuckets:
+    """Per-subject token buckets, keeping at most max_subjects of them.
+
+    Dropping the least recently seen bucket only refills it early.
+    """
+
+    def __init__(self, rate: float, burst: float, max_subjects: int = ADMISSION_MAX_SUBJECTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_subjects = max_subjects
+        self._buckets = OrderedDict()
+
+    def take(self, subject: str) -> float:
+        """Spend a token; return 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(subject, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[subject] = (tokens, now)
+        while len(self._buckets) > self.max_subjects:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionMetrics:
+    def __init__(self):
+        self.admitted = 0
+        self.rate_limited = 0
+        self.user_rejected = 0
+        self.shed = 0
+        self.queued_ms = 0.0
+        self.gates = {}
+
+    def snapshot(self):
+        return {
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "user_rejected": self.user_rejected,
+            "shed": self.shed,
+            "queued_ms": round(self.queued_ms, 3),
+            "in_flight": {name: gate.active for name, gate in self.gates.items() if gate.active},
+            "waiting": {name: len(gate.waiters) for name, gate in self.gates.items() if gate.waiters},
+        }
+
+
+admission_metrics = AdmissionMetrics()
+
+
+class AdmissionMiddleware:
+    """Admit, queue or reject each request before the app does any work.
+
+    In order: a token bucket per JWT subject (429 when empty), an
+    in-flight limit per subject and one per route (both wait up to
+    max_queue_ms for a slot). A subject over its own limit gets 429; a
+    saturated route sheds with 503. Both carry Retry-After. Requests
+    without a valid token only pass the route limits.
+    """
+
+    def __init__(self, app, router, secret: str, algorithm: str,
+                 endpoint_default: int = ADMISSION_ENDPOINT_DEFAULT,
+                 endpoint_limits: dict = ADMISSION_ENDPOINT_LIMITS,
+                 user_inflight: int = ADMISSION_USER_INFLIGHT,
+                 rate: float = ADMISSION_RATE, burst: float = ADMISSION_BURST,
+                 max_queue_ms: float = ADMISSION_MAX_QUEUE_MS, metrics: AdmissionMetrics = admission_metrics):
+        self.app = app
+        self.router = router
+        self.secret = secret
+        self.algorithm = algorithm
+        self.endpoint_default = endpoint_default
+        self.endpoint_limits = endpoint_limits
+        self.user_inflight = user_inflight
+        self.buckets = TokenBuckets(rate, burst) if rate else None
+        self.max_queue = max_queue_ms / 1000
+        self.metrics = metrics
+        self.user_gates = {}
+
+    def route_name(self, scope):
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return f"{scope['method']} {route.path}"
+        return None
+
+    def subject(self, scope):
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer":
+                    return None
+                # A cached principal was verified already; only decode on a miss
+                principal = principal_cache.peek((self.secret, token))
+                if principal is not None:
+                    return principal.email
+                try:
+                    return _decode_token(token, self.secret, self.algorithm)[0]
+                except HTTPException:
+                    return None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self.route_name(scope)
+        subject = None
+        if self.buckets is not None or self.user_inflight:
+            subject = self.subject(scope)
+        if subject is not None and self.buckets is not None:
+            wait = self.buckets.take(subject)
+            if wait:
+                self.metrics.rate_limited += 1
+                await reject(send, 429, "Rate limit exceeded", wait)
+                return
+        if route is None or route in ADMISSION_EXEMPT:
+            await self.app(scope, receive, send)
+            return
+
+        entered = []
+        try:
+            started = time.perf_counter()
+            if subject is not None and self.user_inflight:
+                gate = self.user_gates.get(subject)
+                if gate is None:
+                    gate = self.user_gates[subject] = Gate(self.user_inflight)
+                if not await gate.enter(self.max_queue - (time.perf_counter() - started)):
+                    self.metrics.user_rejected += 1
+                    await reject(send, 429, "Too many concurrent requests", 1)
+                    return
+                entered.append(gate)
+
+            limit = self.endpoint_limits.get(route, self.endpoint_default)
+            if limit:
+                gate = self.metrics.gates.get(route)
+                if gate is None:
+                    gate = self.metrics.gates[route] = Gate(limit)
+                if not await gate.enter(self.max_queue - (time.perf_counter() - started)):
+                    self.metrics.shed += 1
+                    await reject(send, 503, "Server is busy, please retry", 1)
+                    return
+                entered.append(gate)
+
+            self.metrics.admitted += 1
+            self.metrics.queued_ms += (time.perf_counter() - started) * 1000
+            await self.app(scope, receive, send)
+        finally:
+            for gate in entered:
+                gate.leave()
+            if subject is not None:
+                gate = self.user_gates.get(subject)
+                if gate is not None and gate.idle:
+                    del self.user_gates[subject]
+
+
+async def reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import logging
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.database import begin_immediate
+from app.etag import bump_version
+from app.events import queue_event
+from app.models import ArchivedTask, Task
+from app.pagination import apply_cursor
+from app.stats import apply_deltas, stat_key
+
+logger = logging.getLogger(__name__)
+
+# Completed tasks untouched for this long leave the tasks table
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# Tasks moved per transaction, so the write lock is only held briefly
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Run the archiver inside the app this often; 0 leaves it to the CLI
+ARCHIVE_INTERVAL_MINUTES = float(os.getenv("ARCHIVE_INTERVAL_MINUTES", "0"))
+
+TASK_COLUMN_NAMES = [column.key for column in Task.__table__.columns]
+
+
+def archived(columns):
+    """The ArchivedTask columns matching a tuple of Task columns."""
+    return tuple(getattr(ArchivedTask, column.key) for column in columns)
+
+
+def _move(db: Session, source, target, ids, **extra):
+    """Copy rows `ids` from source to target, then delete them.
+
+    Columns named in `extra` are set to its values instead of copied.
+    Returns the per-user stat deltas of the moved rows, as seen by source.
+    """
+    moved = defaultdict(Counter)
+    counts = select(source.user_id, source.category_id, source.status, func.count()).where(
+        source.id.in_(ids)
+    ).group_by(source.user_id, source.category_id, source.status)
+    for user_id, category_id, status, count in db.execute(counts):
+        moved[user_id][stat_key(category_id, status)] += count
+    if not moved:
+        return moved
+
+    names = [name for name in TASK_COLUMN_NAMES if name not in extra]
+    columns = [getattr(source, name) for name in names]
+    values = [literal(value) for value in extra.values()]
+    db.execute(insert(target).from_select(
+        names + list(extra), select(*columns, *values).where(source.id.in_(ids))
+    ))
+    db.execute(delete(source).where(source.id.in_(ids)))
+    return moved
+
+
+def archive_completed(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                      batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move completed tasks last updated before the cutoff to archived_tasks.
+
+    Each batch commits on its own, so an interrupted run keeps what it
+    already moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    total, after_id = 0, 0
+    while True:
+        # Lock before picking the batch, so the rows cannot change under it
+        begin_immediate(db.connection())
+        ids = db.execute(select(Task.id).where(
+            Task.id > after_id,
+            Task.status == "completed",
+            Task.updated_at < cutoff
+        ).order_by(Task.id).limit(batch_size)).scalars().all()
+        if not ids:
+            db.rollback()
+            break
+        moved = _move(db, Task, ArchivedTask, ids, archived_at=datetime.utcnow())
+        for user_id, counts in moved.items():
+            apply_deltas(db, user_id, Counter({key: -count for key, count in counts.items()}))
+            # Default lists change, so cached ETags must not match
+            bump_version(db, user_id)
+        db.commit()
+        total += len(ids)
+        after_id = ids[-1]
+    return total
+
+
+def unarchive_tasks(db: Session, user_id: int, task_ids) -> list:
+    """Move the user's archived tasks back into tasks; returns the ids moved.
+
+    Runs inside the caller's transaction. Restored tasks count as just
+    updated, so the archiver leaves them alone for another full period
+    and delta sync clients pick them up again.
+    """
+    ids = db.execute(select(ArchivedTask.id).where(
+        ArchivedTask.user_id == user_id, ArchivedTask.id.in_(task_ids)
+    )).scalars().all()
+    if ids:
+        moved = _move(db, ArchivedTask, Task, ids, updated_at=datetime.utcnow())
+        apply_deltas(db, user_id, moved[user_id])
+        bump_version(db, user_id)
+        queue_event(db, user_id, "task.updated", ids)
+    return ids
+
+
+def task_conditions(model, user_id: int, status: str = None, category_id: int = None,
+                    due_before: datetime = None, due_after: datetime = None) -> list:
+    """GET /tasks filters for Task or ArchivedTask."""
+    conditions = [model.user_id == user_id]
+    if status:
+        conditions.append(model.status == status)
+    if category_id:
+        conditions.append(model.category_id == category_id)
+    if due_before:
+        conditions.append(model.due_date < due_before)
+    if due_after:
+        conditions.append(model.due_date >= due_after)
+    return conditions
+
+
+def paginate_with_archived(columns: tuple, limit: int, cursor: str = None, **filters):
+    """A page of active and archived tasks ordered by (created_at, id).
+
+    `columns` are Task columns including id and created_at; `filters` go
+    to task_conditions(). Each side is paged on its own index before the
+    two are merged, so neither reads more than a page.
+    """
+    hot = apply_cursor(select(*columns).where(*task_conditions(Task, **filters)), Task, limit, cursor).subquery()
+    cold = apply_cursor(
+        select(*archived(columns)).where(*task_conditions(ArchivedTask, **filters)), ArchivedTask, limit, cursor
+    ).subquery()
+    merged = union_all(select(hot), select(cold)).subquery()
+    return apply_cursor(select(merged), merged.c, limit)
+
+
+async def archive_periodically(session_factory, interval_minutes: float = ARCHIVE_INTERVAL_MINUTES):
+    """Run archive_completed() every interval until cancelled."""
+    def run():
+        with session_factory() as db:
+            return archive_completed(db)
+
+    while True:
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            archived_count = await run_in_threadpool(run)
+            logger.info("archived completed tasks", extra={"archived": archived_count})
+        except Exception:
+            logger.exception("task archiving failed")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move old completed tasks to archived_tasks and back")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Archive completed tasks")
+    run_parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="Archive tasks completed this many days ago")
+    run_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    restore_parser = subparsers.add_parser("unarchive", help="Move archived tasks back")
+    restore_parser.add_argument("--user", type=int, required=True)
+    restore_parser.add_argument("task_ids", type=int, nargs="+")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "run":
+            print(f"Archived {archive_completed(db, args.days, args.batch_size)} tasks")
+        else:
+            restored = unarchive_tasks(db, args.user, args.task_ids)
+            db.commit()
+            print(f"Unarchived {len(restored)} tasks")
@@ -0,0 +1,266 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.models import ArchivedTask, Category, Task
+from app import schemas
+from app.principal_cache import Principal
+from app.instrumentation import query_budget
+from app.etag import bump_version, conditional, current_version
+from app.archive import archived, paginate_with_archived, task_conditions
+from app.events import queue_event
+from app.idempotency import REPLAY_HEADER, find_response, fingerprint, idempotency_key, save_response
+from app.stats import record_change, stat_key
+from app.sync import record_deletions
+from app.projections import (
+    CATEGORY_LIST_COLUMNS, TASK_DETAIL_COLUMNS, TASK_LIST_COLUMNS,
+    category_item, fast_json, task_detail, task_list_item, task_projection
+)
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, apply_cursor, split_page
+
+
+def build_router(get_current_user) -> APIRouter:
+    """AsyncSession versions of the task and category endpoints.
+
+    Paths, parameters and payloads mirror the sync endpoints in main.py so
+    the two modes can be benchmarked against the same clients.
+    """
+    router = APIRouter()
+
+    async def load_task(db: AsyncSession, task_id: int, user_id: int):
+        result = await db.execute(select(Task).where(Task.id == task_id, Task.user_id == user_id))
+        task = result.scalar_one_or_none()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return task
+
+    async def stored_response(db: AsyncSession, response: Response, user_id: int, key: str, request_fingerprint: str):
+        if not key:
+            return None
+        stored = await db.run_sync(find_response, user_id, key, request_fingerprint)
+        if stored is not None:
+            response.headers[REPLAY_HEADER] = "true"
+        return stored
+
+    async def commit_once(db: AsyncSession, user_id: int, key: str, request_fingerprint: str, result):
+        if key:
+            await db.run_sync(save_response, user_id, key, request_fingerprint, result)
+        await db.commit()
+        return result
+
+    @router.post("/categories")
+    @query_budget(6)
+    async def create_category(
+        category: schemas.CategoryCreate,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user),
+        key: str = Depends(idempotency_key)
+    ):
+        request_fingerprint = fingerprint("POST", "/categories", category)
+        stored = await stored_response(db, response, current_user.id, key, request_fingerprint)
+        if stored is not None:
+            return stored
+        try:
+            db_category = Category(name=category.name, user_id=current_user.id)
+            db.add(db_category)
+            await db.run_sync(bump_version, current_user.id)
+            await db.flush()
+            created = {"id": db_category.id, "name": db_category.name, "user_id": db_category.user_id}
+            return await commit_once(db, current_user.id, key, request_fingerprint, created)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.get("/categories")
+    @query_budget(3)
+    async def list_categories(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user)
+    ):
+        version = await db.run_sync(current_version, current_user.id)
+        cached = conditional(request, response, current_user.id, version)
+        if cached:
+            return cached
+        result = await db.execute(select(*CATEGORY_LIST_COLUMNS).where(Category.user_id == current_user.id))
+        return fast_json([category_item(cat) for cat in result], response)
+
+    @router.post("/tasks")
+    @query_budget(7)
+    async def create_task(
+        task: schemas.TaskCreate,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user),
+        key: str = Depends(idempotency_key)
+    ):
+        request_fingerprint = fingerprint("POST", "/tasks", task)
+        stored = await stored_response(db, response, current_user.id, key, request_fingerprint)
+        if stored is not None:
+            return stored
+        try:
+            db_task = Task(
+                title=task.title,
+                description=task.description,
+                status=task.status,
+                due_date=task.due_date,
+                category_id=task.category_id,
+                user_id=current_user.id
+            )
+            db.add(db_task)
+            await db.flush()
+            await db.run_sync(record_change, current_user.id, None, stat_key(task.category_id, task.status))
+            await db.run_sync(bump_version, current_user.id)
+            queue_event(db, current_user.id, "task.created", [db_task.id])
+            created = {
+                "id": db_task.id,
+                "title": db_task.title,
+                "description": db_task.description,
+                "status": db_task.status,
+                "category_id": db_task.category_id,
+                "user_id": db_task.user_id
+            }
+            return await commit_once(db, current_user.id, key, request_fingerprint, created)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.get("/tasks")
+    @query_budget(3)
+    async def list_tasks(
+        request: Request,
+        response: Response,
+        status: str = None,
+        category_id: int = None,
+        due_before: datetime = None,
+        due_after: datetime = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str = None,
+        fields: str = Query(None, description="Comma-separated task fields to return, e.g. id,title"),
+        include_archived: bool = False,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user)
+    ):
+        columns, serialize = task_projection(fields, TASK_LIST_COLUMNS, task_list_item, "id", "created_at")
+        version = await db.run_sync(current_version, current_user.id)
+        cached = conditional(request, response, current_user.id, version)
+        if cached:
+            return cached
+
+        filters = dict(
+            user_id=current_user.id, status=status, category_id=category_id, due_before=due_before, due_after=due_after
+        )
+        if include_archived:
+            stmt = paginate_with_archived(columns, limit, cursor, **filters)
+        else:
+            stmt = apply_cursor(select(*columns).where(*task_conditions(Task, **filters)), Task, limit, cursor)
+        result = await db.execute(stmt)
+        tasks, next_cursor = split_page(result.all(), limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return fast_json([serialize(task) for task in tasks], response)
+
+    @router.get("/tasks/{task_id}")
+    @query_budget(3)
+    async def get_task(
+        task_id: int,
+        fields: str = Query(None, description="Comma-separated task fields to return, e.g. id,title"),
+        include_archived: bool = False,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user)
+    ):
+        columns, serialize = task_projection(fields, TASK_DETAIL_COLUMNS, task_detail)
+        result = await db.execute(select(*columns).where(Task.id == task_id, Task.user_id == current_user.id))
+        task = result.first()
+        if not task and include_archived:
+            result = await db.execute(select(*archived(columns)).where(
+                ArchivedTask.id == task_id, ArchivedTask.user_id == current_user.id
+            ))
+            task = result.first()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return fast_json(serialize(task))
+
+    @router.put("/tasks/{task_id}")
+    @query_budget(8)
+    async def update_task(
+        task_id: int,
+        task_update: schemas.TaskUpdate,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user),
+        key: str = Depends(idempotency_key)
+    ):
+        request_fingerprint = fingerprint("PUT", f"/tasks/{task_id}", task_update)
+        stored = await stored_response(db, response, current_user.id, key, request_fingerprint)
+        if stored is not None:
+            return stored
+        task = await load_task(db, task_id, current_user.id)
+        old_key = stat_key(task.category_id, task.status)
+
+        if task_update.title is not None:
+            task.title = task_update.title
+        if task_update.status is not None:
+            task.status = task_update.status
+        if task_update.description is not None:
+            task.description = task_update.description
+        if task_update.due_date is not None:
+            task.due_date = task_update.due_date
+        if task_update.category_id is not None:
+            task.category_id = task_update.category_id
+        new_key = stat_key(task.category_id, task.status)
+        if new_key != old_key:
+            await db.run_sync(record_change, current_user.id, old_key, new_key)
+        await db.run_sync(bump_version, current_user.id)
+        queue_event(db, current_user.id, "task.updated", [task.id])
+
+        updated = {
+            "message": "Task updated",
+            "task_id": task.id,
+            "title": task.title,
+            "status": task.status
+        }
+        return await commit_once(db, current_user.id, key, request_fingerprint, updated)
+
+    @router.delete("/tasks/{task_id}")
+    @query_budget(8)
+    async def delete_task(
+        task_id: int,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: Principal = Depends(get_current_user),
+        key: str = Depends(idempotency_key)
+    ):
+        request_fingerprint = fingerprint("DELETE", f"/tasks/{task_id}")
+        stored = await stored_response(db, response, current_user.id, key, request_fingerprint)
+        if stored is not None:
+            return stored
+        task = await load_task(db, task_id, current_user.id)
+        await db.delete(task)
+        await db.run_sync(record_change, current_user.id, stat_key(task.category_id, task.status))
+        await db.run_sync(bump_version, current_user.id)
+        await db.run_sync(record_deletions, current_user.id, [task.id])
+        queue_event(db, current_user.id, "task.deleted", [task.id])
+        return await commit_once(db, current_user.id, key, request_fingerprint, {"message": "Task deleted"})
+
+    return router
+
+
+def use_async_routes(app, router: APIRouter):
+    """Swap sync routes for their async counterparts in place.
+
+    Replacing in place keeps route order, so literal paths such as
+    /tasks/export still match before /tasks/{task_id}.
+    """
+    replacements = {(route.path, frozenset(route.methods)): route for route in router.routes}
+    app.router.routes = [
+        replacements.get((getattr(route, "path", None), frozenset(getattr(route, "methods", None) or ())), route)
+        for route in app.router.routes
+    ]
@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from jose import jwt
+from fastapi import Depends
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
-import hashlib  # Add this
 
 from . import crud
 from .database import get_db
+from .hashing import pwd_context
+from .principal_cache import resolve_principal
 
 security = HTTPBearer()
 
@@ -15,13 +16,11 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 def verify_password(plain_password, hashed_password):
-    # Same simple hashing as in crud.py
-    test_hash = hashlib.sha256(plain_password.encode()).hexdigest()
-    return test_hash == hashed_password
+    # Accepts bcrypt and legacy SHA-256 hashes, see app/hashing.py
+    return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    # Same simple hashing as in crud.py
-    return hashlib.sha256(password.encode()).hexdigest()
+    return pwd_context.hash(password)
 
 def authenticate_user(db: Session, email: str, password: str):
     user = crud.get_user_by_email(db, email)
@@ -38,15 +37,4 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def get_current_user(credentials: str = Depends(security), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = crud.get_user_by_email(db, email=email)
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
\ No newline at end of file
+    return resolve_principal(credentials.credentials, SECRET_KEY, ALGORITHM, db)
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+
+from sqlalchemy import and_, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import Category, Task
+
+BOARD_GROUP_SIZE = int(os.getenv("BOARD_GROUP_SIZE", "20"))
+MAX_BOARD_GROUP_SIZE = 200
+
+
+def board_query(user_id: int, per_group: int):
+    """One statement for the whole board: every category, each (category,
+    status) group's first `per_group` tasks, and each group's full count.
+
+    Tasks are ranked and counted with window functions in a CTE that both
+    halves of the UNION share, so only the rows that are returned leave
+    the database. Categories without tasks still
+    produce one row with NULL task columns.
+    """
+    group = (Task.category_id, Task.status)
+    ranked = select(
+        Task.id, Task.title, Task.status, Task.category_id, Task.due_date,
+        func.row_number().over(partition_by=group, order_by=(Task.created_at, Task.id)).label("position"),
+        func.count().over(partition_by=group).label("group_count"),
+    ).where(Task.user_id == user_id).cte("ranked")
+
+    columns = (ranked.c.id, ranked.c.title, ranked.c.status, ranked.c.due_date, ranked.c.position, ranked.c.group_count)
+    categorized = select(Category.id.label("category_id"), Category.name, literal(0).label("uncategorized"), *columns).outerjoin(
+        ranked, and_(ranked.c.category_id == Category.id, ranked.c.position <= per_group)
+    ).where(Category.user_id == user_id)
+    uncategorized = select(null().label("category_id"), null().label("name"), literal(1), *columns).where(
+        ranked.c.category_id.is_(None), ranked.c.position <= per_group
+    )
+    board = union_all(categorized, uncategorized).subquery()
+    return select(board).order_by(board.c.uncategorized, board.c.category_id, board.c.status, board.c.position)
+
+
+def load_board(db: Session, user_id: int, per_group: int = BOARD_GROUP_SIZE) -> list:
+    columns = {}
+    for row in db.execute(board_query(user_id, per_group)):
+        column = columns.get(row.category_id)
+        if column is None:
+            column = columns[row.category_id] = {"category_id": row.category_id, "name": row.name, "groups": {}}
+        if row.id is None:
+            continue
+        group = column["groups"].setdefault(row.status or "", {"count": row.group_count, "tasks": []})
+        group["tasks"].append({
+            "id": row.id,
+            "title": row.title,
+            "due_date": row.due_date.isoformat() if row.due_date else None,
+        })
+    return list(columns.values())
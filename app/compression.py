@@ -0,0 +1,135 @@
+import os
+import zlib
+
+from starlette.datastructures import MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Quality 4 compresses better than gzip -6 at a similar CPU cost; 11 is for static assets
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Event streams must reach the client unbuffered; the rest are already compressed
+SKIP_CONTENT_TYPES = ("text/event-stream", "image/", "application/gzip", "application/zip")
+
+
+def negotiate(accept_encoding: str):
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None.
+
+    Highest q-value wins, brotli on a tie; q=0 refuses an encoding.
+    """
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in (("br",) if brotli else ()) + ("gzip",):
+        quality = offered.get(encoding, offered.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def make_encoder(encoding: str):
+    """Return (compress, finish) for one response body.
+
+    compress() flushes after every chunk so a streamed export still
+    reaches the client chunk by chunk.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (lambda data: compressor.process(data) + compressor.flush()), compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return (lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+class CompressionMiddleware:
+    """Compress response bodies with brotli or gzip, as Accept-Encoding allows.
+
+    Complete bodies under minimum_size are sent as they are, since below
+    about a kilobyte the headers and CPU cost more than the bytes saved.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compress = finish = None
+
+        async def send_compressed(message):
+            nonlocal start, compress, finish
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                start["headers"] = list(start.get("headers", []))
+                headers = MutableHeaders(scope=start)
+                skip = (
+                    "content-encoding" in headers
+                    or headers.get("content-type", "").startswith(SKIP_CONTENT_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if not skip:
+                    compress, finish = make_encoder(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    # The encoded bytes differ from the identity ones, so like
+                    # nginx keep the validator but mark it weak
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                    if not more_body:
+                        body = compress(body) + finish()
+                        headers["Content-Length"] = str(len(body))
+                        await send(start)
+                        await send({"type": "http.response.body", "body": body})
+                        start = None
+                        return
+                await send(start)
+                start = None
+
+            if compress is None:
+                await send(message)
+                return
+            body = compress(body)
+            if not more_body:
+                body += finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
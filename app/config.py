@@ -0,0 +1,73 @@
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Per-connection PRAGMA profiles for SQLite. "wal" lets readers proceed
+# while a writer holds the lock; "durable" keeps WAL but fsyncs every commit.
+SQLITE_PROFILES = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "busy_timeout": 5000,
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+
+SQLITE_PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout")
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+@dataclass
+class Settings:
+    database_url: str = "sqlite:///./task_manager.db"
+    # Optional replica or read-only URL; defaults to database_url
+    database_read_url: Optional[str] = None
+    db_mode: str = "sync"
+    sqlite_profile: str = "wal"
+    sqlite_pragmas: dict = field(default_factory=dict)
+    # Pool sizing, only applied to server databases (not SQLite)
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    read_pool_size: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        defaults = cls()
+        pragmas = {}
+        for name in SQLITE_PRAGMAS:
+            value = os.getenv(f"SQLITE_{name.upper()}")
+            if value:
+                pragmas[name] = value
+        return cls(
+            database_url=os.getenv("DATABASE_URL", defaults.database_url),
+            database_read_url=os.getenv("DATABASE_READ_URL") or None,
+            db_mode=os.getenv("DB_MODE", defaults.db_mode),
+            sqlite_profile=os.getenv("SQLITE_PROFILE", defaults.sqlite_profile),
+            sqlite_pragmas=pragmas,
+            pool_size=_env_int("DB_POOL_SIZE", defaults.pool_size),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", defaults.max_overflow),
+            pool_timeout=_env_int("DB_POOL_TIMEOUT", defaults.pool_timeout),
+            pool_recycle=_env_int("DB_POOL_RECYCLE", defaults.pool_recycle),
+            read_pool_size=_env_int("DB_READ_POOL_SIZE", None),
+        )
+
+    def pragmas(self) -> dict:
+        if self.sqlite_profile not in SQLITE_PROFILES:
+            raise ValueError(f"Unknown SQLITE_PROFILE {self.sqlite_profile!r}")
+        return {**SQLITE_PROFILES[self.sqlite_profile], **self.sqlite_pragmas}
+
+
+settings = Settings.from_env()
@@ -1,9 +1,15 @@
+import logging
+
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-import hashlib  # Add this import
 
 from . import models, schemas
+from .hashing import pwd_context
+from .principal_cache import principal_cache
+from .pagination import DEFAULT_PAGE_SIZE, paginate_tasks
+
+logger = logging.getLogger(__name__)
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
@@ -11,24 +17,22 @@ def get_user_by_email(db: Session, email: str):
 
 def create_user(db: Session, user: schemas.UserCreate):
     try:
-        print(f" Creating user: {user.email}")
+        logger.info("creating user", extra={"email": user.email})
         
-        # MINIMAL HASHING - This cannot fail
-        import hashlib
-        hashed_password = hashlib.sha256(user.password.encode()).hexdigest()
-        print(f" Password hashed: {hashed_password[:20]}...")
+        hashed_password = pwd_context.hash(user.password)
         
         # Create user
         db_user = models.User(email=user.email, hashed_password=hashed_password)
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        principal_cache.invalidate_user(email=db_user.email)
         
-        print(f" User created: {db_user.id}")
+        logger.info("user created", extra={"user_id": db_user.id})
         return db_user
         
-    except Exception as e:
-        print(f" Error in create_user: {str(e)}")
+    except Exception:
+        logger.exception("create_user failed")
         db.rollback()
         raise
 
@@ -50,8 +54,9 @@ def create_task(db: Session, task: schemas.TaskCreate, user_id: int):
     db.refresh(db_task)
     return db_task
 
-def get_tasks(db: Session, user_id: int, status: Optional[str] = None,
-            category_id: Optional[int] = None, due_date: Optional[datetime] = None):
+def _task_query(db: Session, user_id: int, status: Optional[str] = None,
+                category_id: Optional[int] = None, due_date: Optional[datetime] = None,
+                due_before: Optional[datetime] = None, due_after: Optional[datetime] = None):
     query = db.query(models.Task).filter(models.Task.user_id == user_id)
     
     if status:
@@ -60,8 +65,24 @@ def get_tasks(db: Session, user_id: int, status: Optional[str] = None,
         query = query.filter(models.Task.category_id == category_id)
     if due_date:
         query = query.filter(models.Task.due_date == due_date)
-    
-    return query.all()
+    if due_before:
+        query = query.filter(models.Task.due_date < due_before)
+    if due_after:
+        query = query.filter(models.Task.due_date >= due_after)
+    return query
+
+def get_tasks(db: Session, user_id: int, status: Optional[str] = None,
+            category_id: Optional[int] = None, due_date: Optional[datetime] = None,
+            due_before: Optional[datetime] = None, due_after: Optional[datetime] = None):
+    return _task_query(db, user_id, status, category_id, due_date, due_before, due_after).all()
+
+def get_task_page(db: Session, user_id: int, status: Optional[str] = None,
+            category_id: Optional[int] = None, due_date: Optional[datetime] = None,
+            due_before: Optional[datetime] = None, due_after: Optional[datetime] = None,
+            limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
+    """One keyset page of get_tasks(): (rows, cursor for the next page or None)."""
+    query = _task_query(db, user_id, status, category_id, due_date, due_before, due_after)
+    return paginate_tasks(query, models.Task, limit, cursor)
 
 def get_task(db: Session, task_id: int, user_id: int):
     return db.query(models.Task).filter(
@@ -1,16 +1,157 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./task_manager.db"
+from app.config import settings
+from app.instrumentation import instrument_engine
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = settings.database_url
+SQLALCHEMY_READ_DATABASE_URL = settings.database_read_url or settings.database_url
 
-def get_db():
-    db = SessionLocal()
+# "sync" serves endpoints from the threadpool with Session, "async" swaps the
+# task and category endpoints for AsyncSession versions (see async_routes.py)
+DB_MODE = settings.db_mode
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def engine_options(url: str, role: str = "write", config=settings) -> dict:
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    pool_size = config.pool_size
+    if role == "read" and config.read_pool_size is not None:
+        pool_size = config.read_pool_size
+    return {
+        "pool_size": pool_size,
+        "max_overflow": config.max_overflow,
+        "pool_timeout": config.pool_timeout,
+        "pool_recycle": config.pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+def install_sqlite_pragmas(sync_engine, role: str = "write", config=settings):
+    """Apply the configured PRAGMA profile to every new SQLite connection."""
+    pragmas = dict(config.pragmas())
+    if role == "read":
+        pragmas["query_only"] = "ON"
+
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def begin_immediate(connection):
+    """Open the transaction of `connection` with BEGIN IMMEDIATE on SQLite.
+
+    Only for sessions that are meant to write, such as the group-commit
+    writer's: the write lock is taken up front, so a read made before the
+    first write can never go stale (SQLITE_BUSY_SNAPSHOT, which
+    busy_timeout does not retry). SAVEPOINTs then nest inside it instead
+    of pysqlite letting the first one open the transaction. Request
+    sessions keep pysqlite's deferred transactions.
+    """
+    if connection.dialect.name == "sqlite":
+        # Straight to the driver, so it is not counted as a query
+        connection.connection.driver_connection.execute("BEGIN IMMEDIATE")
+
+def make_engine(url: str, role: str = "write", config=settings):
+    engine = create_engine(url, **engine_options(url, role, config))
+    if is_sqlite(url):
+        install_sqlite_pragmas(engine, role, config)
+    instrument_engine(engine)
+    return engine
+
+class Database:
+    """The engines and session factories for one Settings.
+
+    Every app from create_app() owns one, so apps built for different
+    settings never share connections. Engines connect lazily, so building
+    a Database touches no database file.
+    """
+
+    def __init__(self, config):
+        self.settings = config
+        self.url = config.database_url
+        self.read_url = config.database_read_url or config.database_url
+        self.engine = make_engine(self.url, config=config)
+        self.read_engine = make_engine(self.read_url, role="read", config=config)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.read_engine)
+        # Built on first use so sync deployments never need aiosqlite
+        self._async_engine = None
+        self.AsyncSessionLocal = None
+
+    def get_async_engine(self):
+        if self._async_engine is None:
+            url = to_async_url(self.url)
+            options = engine_options(url, config=self.settings)
+            options.pop("connect_args", None)
+            self._async_engine = create_async_engine(url, **options)
+            if is_sqlite(url):
+                install_sqlite_pragmas(self._async_engine.sync_engine, config=self.settings)
+            instrument_engine(self._async_engine.sync_engine)
+            self.AsyncSessionLocal = async_sessionmaker(self._async_engine, expire_on_commit=False)
+        return self._async_engine
+
+    async def dispose(self):
+        self.engine.dispose()
+        self.read_engine.dispose()
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+
+# The database of the environment's settings, used by the module-level app
+# and the command-line tools
+default = Database(settings)
+engine = default.engine
+read_engine = default.read_engine
+SessionLocal = default.SessionLocal
+ReadSessionLocal = default.ReadSessionLocal
+
+UPSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+def upsert_insert(db):
+    """Dialect insert() supporting on_conflict_do_update for db's bind."""
+    return UPSERTS[db.get_bind().dialect.name]
+
+def app_database(request: Request) -> Database:
+    """The Database of the app serving `request`."""
+    return getattr(request.app.state, "database", default)
+
+def get_db(request: Request):
+    db = app_database(request).SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db(request: Request):
+    """Session for GET endpoints, bound to the read engine."""
+    db = app_database(request).ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db(request: Request):
+    database = app_database(request)
+    database.get_async_engine()
+    async with database.AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,51 @@
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from app.database import upsert_insert
+from app.models import ChangeVersion
+
+
+def bump_version(db: Session, user_id: int):
+    """Advance the user's change version inside the caller's transaction."""
+    stmt = upsert_insert(db)(ChangeVersion).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChangeVersion.user_id],
+        set_={"version": ChangeVersion.version + 1},
+    )
+    db.execute(stmt)
+
+
+def current_version(db: Session, user_id: int) -> int:
+    version = db.query(ChangeVersion.version).filter(ChangeVersion.user_id == user_id).scalar()
+    return version or 0
+
+
+def make_etag(user_id: int, version: int, request: Request) -> str:
+    # Different filters or pages of the same version are different payloads
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{user_id}:{version}:{request.url.path}?{query}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def conditional(request: Request, response: Response, user_id: int, version: int):
+    """Set caching headers and return a 304 response if the client is current.
+
+    Callers read the version before running their list query, so a payload
+    can be newer than its ETag but never older.
+    """
+    etag = make_etag(user_id, version, request)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
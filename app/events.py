@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "memory")
+# Events a subscriber may fall behind by before it is cut off with "overflow"
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "256"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+OVERFLOW = {"type": "overflow"}
+
+
+class Subscription:
+    """One stream's bounded buffer, filled and drained on the stream's event loop."""
+
+    def __init__(self, user_id: int, buffer_size: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    def deliver(self, payload: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # A client this far behind has to refetch anyway, so its backlog
+            # is dropped and the only thing left to tell it is that
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class MemoryBroker:
+    """Fans events out to the subscribers in this process.
+
+    publish() may be called from any thread. A backend spanning several
+    workers (Redis pub/sub, Postgres LISTEN/NOTIFY) provides the same
+    subscribe/unsubscribe/publish/stats methods and hands incoming events
+    to Subscription.deliver on the subscriber's loop.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.buffer_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: int, payload: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, payload)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+            }
+
+
+BACKENDS = {
+    "memory": MemoryBroker,
+}
+
+broker = BACKENDS[EVENT_BACKEND]()
+
+
+def queue_event(db, user_id: int, type: str, ids):
+    """Publish a task event once db's transaction commits; rollback drops it."""
+    db.info.setdefault("pending_events", []).append((user_id, {"type": type, "ids": list(ids)}))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for user_id, payload in session.info.pop("pending_events", ()):
+        broker.publish(user_id, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop("pending_events", None)
+
+
+async def event_stream(user_id: int, keepalive: float = EVENT_KEEPALIVE_SECONDS):
+    """Server-Sent Events for one user's task changes, until the client leaves."""
+    subscription = broker.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+            if payload is OVERFLOW:
+                return
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select, union_all
+
+from app.archive import archived, task_conditions
+from app.models import ArchivedTask, Task
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.status,
+    Task.due_date,
+    Task.category_id,
+    Task.created_at,
+    Task.updated_at,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _iter_partitions(session_factory, user_id: int, include_archived: bool = False, **filters):
+    # The export outlives the request's get_db() session, so it owns one
+    with session_factory() as db:
+        stmt = select(*EXPORT_COLUMNS).where(*task_conditions(Task, user_id, **filters))
+        if include_archived:
+            cold = select(*archived(EXPORT_COLUMNS)).where(*task_conditions(ArchivedTask, user_id, **filters))
+            merged = union_all(stmt, cold).subquery()
+            stmt = select(merged).order_by(merged.c.created_at, merged.c.id)
+        else:
+            stmt = stmt.order_by(Task.created_at, Task.id)
+        stmt = stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+        for partition in db.execute(stmt).partitions():
+            yield partition
+
+
+def iter_ndjson(session_factory, user_id: int, **filters):
+    for rows in _iter_partitions(session_factory, user_id, **filters):
+        yield "".join(
+            json.dumps({field: _plain(value) for field, value in zip(EXPORT_FIELDS, row)}) + "\n"
+            for row in rows
+        )
+
+
+def iter_csv(session_factory, user_id: int, **filters):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    # Send the header right away so clients see the first byte immediately
+    writer.writerow(EXPORT_FIELDS)
+    yield drain()
+    for rows in _iter_partitions(session_factory, user_id, **filters):
+        writer.writerows([_plain(value) for value in row] for row in rows)
+        yield drain()
+
+
+EXPORTERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+}
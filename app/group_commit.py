@@ -0,0 +1,161 @@
+import asyncio
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.database import SessionLocal, begin_immediate
+
+logger = logging.getLogger(__name__)
+
+# A batch closes when it holds this many writes, or when the window after
+# its first write has passed. With no window, a batch is whatever queued
+# up while the previous commit was running, so an idle server adds no delay.
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0"))
+
+_STOP = object()
+
+
+class _Write:
+    __slots__ = ("fn", "args", "future", "context")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        # Run under the caller's context so per-request query stats and
+        # profiles still see the statements
+        self.context = contextvars.copy_context()
+
+    def apply(self, db):
+        return self.context.run(self.fn, db, *self.args)
+
+
+class GroupCommitWriter:
+    """One thread that applies queued writes and commits them in batches.
+
+    On SQLite every commit takes the database write lock and syncs the
+    WAL, so committing many requests' writes at once raises write
+    throughput. Each write is a function fn(db, *args) that must not
+    commit. It runs inside its own SAVEPOINT, so a failing write (a 404,
+    a reused idempotency key) is rolled back alone and only fails its
+    own caller. Its future resolves once the batch holding it has
+    committed. With the default `wal` profile (synchronous=NORMAL) a
+    commit survives a crash of the process but not necessarily a power
+    loss; SQLITE_PROFILE=durable fsyncs every commit, and batching is
+    what keeps that affordable.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = GROUP_COMMIT_MAX_BATCH,
+                 window_ms: float = GROUP_COMMIT_WINDOW_MS):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+        self.largest_batch = 0
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+        write = _Write(fn, args)
+        self._queue.put(write)
+        return write.future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stop(self):
+        """Commit everything already queued, then stop the writer thread."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "failed": self.failed,
+            "largest_batch": self.largest_batch,
+        }
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = _STOP in batch
+            batch = [write for write in batch if write is not _STOP]
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as exc:
+                    # The thread must outlive any batch, or every later write hangs
+                    logger.exception("group commit failed")
+                    for write in batch:
+                        if not write.future.done():
+                            write.future.set_exception(exc)
+            if stop:
+                return
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        self.batches += 1
+        self.writes += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        applied = []
+        with self.session_factory() as db:
+            # As the one designated writer, take the write lock for the batch
+            begin_immediate(db.connection())
+            for write in batch:
+                # A caller cancelled while queued gets nothing applied
+                if not write.future.set_running_or_notify_cancel():
+                    continue
+                # Events queued by a write that fails must not be published
+                pending = list(db.info.get("pending_events", ()))
+                savepoint = db.begin_nested()
+                # Send the SAVEPOINT now, outside the caller's query stats
+                db.connection()
+                try:
+                    result = write.apply(db)
+                    savepoint.commit()
+                except Exception as exc:
+                    savepoint.rollback()
+                    db.info["pending_events"] = pending
+                    self.failed += 1
+                    write.future.set_exception(exc)
+                    continue
+                applied.append((write, result))
+            try:
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                for write, _ in applied:
+                    write.future.set_exception(exc)
+                return
+        for write, result in applied:
+            write.future.set_result(result)
+
+
+group_commit = GroupCommitWriter()
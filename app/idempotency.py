@@ -0,0 +1,118 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.database import upsert_insert
+from app.models import IdempotencyKey
+
+# A retry after this long runs again as a new request
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# Beyond this many stored responses the oldest are dropped early
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+# Every this many saved responses, the save also expires old ones
+IDEMPOTENCY_PURGE_EVERY = 1000
+MAX_KEY_LENGTH = 255
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+_saved = itertools.count(1)
+
+
+def idempotency_key(idempotency_key: str = Header(None, min_length=1, max_length=MAX_KEY_LENGTH)):
+    """The request's Idempotency-Key header, if any."""
+    return idempotency_key
+
+
+def fingerprint(method: str, path: str, payload=None) -> str:
+    raw = json.dumps([method, path, jsonable_encoder(payload)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cutoff():
+    return datetime.utcnow() - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+
+
+def find_response(db: Session, user_id: int, key: str, request_fingerprint: str):
+    """The stored response for `key`, or None if it has not been used yet.
+
+    Raises 422 when the key was used for a different request.
+    """
+    row = db.execute(select(IdempotencyKey.fingerprint, IdempotencyKey.response).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at >= _cutoff()
+    )).first()
+    if row is None:
+        return None
+    if row.fingerprint != request_fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return json.loads(row.response)
+
+
+def save_response(db: Session, user_id: int, key: str, request_fingerprint: str, response):
+    """Store `response` for `key` inside the caller's transaction.
+
+    Only responses whose write commits are stored, so a failed request
+    can be retried with the same key. Raises 409 if another request with
+    the key committed first.
+    """
+    now = datetime.utcnow()
+    values = {"fingerprint": request_fingerprint, "response": json.dumps(jsonable_encoder(response)), "created_at": now}
+    stmt = upsert_insert(db)(IdempotencyKey).values(user_id=user_id, key=key, **values)
+    # An expired row is reused; a live one belongs to a request already served
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+        set_=values,
+        where=IdempotencyKey.created_at < _cutoff(),
+    )
+    if db.execute(stmt).rowcount == 0:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is already being processed")
+    if next(_saved) % IDEMPOTENCY_PURGE_EVERY == 0:
+        expire_responses(db)
+
+
+def run_once(db: Session, user_id: int, key: str, request_fingerprint: str, write, *args):
+    """Run write(db, user_id, *args) unless `key` already has a response.
+
+    Returns (response, replayed). Meant to run as one group-commit write,
+    whose single writer thread makes the lookup and the save atomic.
+    """
+    if key is None:
+        return write(db, user_id, *args), False
+    stored = find_response(db, user_id, key, request_fingerprint)
+    if stored is not None:
+        return stored, True
+    response = write(db, user_id, *args)
+    save_response(db, user_id, key, request_fingerprint, response)
+    return response, False
+
+
+def expire_responses(db: Session, max_keys: int = IDEMPOTENCY_MAX_KEYS) -> int:
+    """Delete expired responses and trim to the newest `max_keys`; the caller commits."""
+    expired = db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < _cutoff())).rowcount
+    newest = select(IdempotencyKey.created_at).order_by(IdempotencyKey.created_at.desc()).offset(max_keys).limit(1)
+    boundary = db.execute(newest).scalar()
+    if boundary is not None:
+        expired += db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at <= boundary)).rowcount
+    return expired
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain stored Idempotency-Key responses")
+    parser.add_argument("command", choices=["purge"])
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        purged = expire_responses(db)
+        db.commit()
+        print(f"Purged {purged} stored responses")
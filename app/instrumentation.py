@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from app.profiling import current_profile
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# When set (the test suite does), exceeding an endpoint's budget raises
+QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "") not in ("", "0")
+
+slow_query_log = logging.getLogger("app.sql.slow")
+
+_request_queries = ContextVar("request_queries", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestQueries:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def query_budget(limit: int):
+    """Declare the most queries an endpoint may issue per request.
+
+    Apply it beneath the route decorator. Budgets are checked by
+    QueryStatsMiddleware when QUERY_BUDGET_ENFORCE is set, which catches
+    lazy-loaded relationships turning into N+1 queries.
+    """
+    def decorate(endpoint):
+        endpoint.__query_budget__ = limit
+        return endpoint
+    return decorate
+
+
+def compact(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def instrument_engine(sync_engine):
+    """Count and time every statement; feeds request stats, profiles and the slow log."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+        profile = current_profile()
+        if profile is not None:
+            profile.add("db", elapsed)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            rows = len(parameters) if executemany else 1
+            # Statements carry placeholders, so leaving out `parameters`
+            # keeps user data out of the log
+            slow_query_log.warning(
+                "slow query %.1f ms (%d parameter set(s) redacted): %s",
+                elapsed * 1000, rows, compact(statement)
+            )
+
+
+class QueryMetrics:
+    """Process-wide per-endpoint totals of requests, queries and DB time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint: str, stats: RequestQueries):
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, {"requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0})
+            totals["requests"] += 1
+            totals["queries"] += stats.count
+            totals["db_ms"] += stats.seconds * 1000
+            totals["max_queries"] = max(totals["max_queries"], stats.count)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {**totals, "db_ms": round(totals["db_ms"], 3)}
+                for endpoint, totals in self._endpoints.items()
+            }
+
+
+query_metrics = QueryMetrics()
+
+
+class QueryStatsMiddleware:
+    """Per-request query count and DB time, as headers and in query_metrics."""
+
+    def __init__(self, app, enforce_budgets: bool = QUERY_BUDGET_ENFORCE):
+        self.app = app
+        self.enforce_budgets = enforce_budgets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueries()
+        token = _request_queries.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                self.check_budget(scope, stats)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.seconds * 1000:.3f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_queries.reset(token)
+            endpoint = scope.get("endpoint")
+            if endpoint is not None:
+                query_metrics.record(f"{scope['method']} {endpoint.__name__}", stats)
+
+    def check_budget(self, scope, stats: RequestQueries):
+        budget = getattr(scope.get("endpoint"), "__query_budget__", None)
+        if self.enforce_budgets and budget is not None and stats.count > budget:
+            raise QueryBudgetExceeded(
+                f"{scope['method']} {scope['path']} issued {stats.count} queries, budget is {budget}"
+            )
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+
+def _parse_rates(value: str) -> dict:
+    """Parse "logger=rate,other.logger=rate" into a dict of floats."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+# Fraction of below-WARNING records kept, and records/second allowed, per logger
+LOG_SAMPLE_RATES = _parse_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_RATE_LIMITS = _parse_rates(os.getenv("LOG_RATE_LIMITS", "app.sql.slow=20"))
+
+request_id_var = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+
+def _lookup(table: dict, name: str):
+    # "app.sql.slow" falls back to "app.sql", then "app"
+    while name:
+        if name in table:
+            return table[name]
+        name = name.rpartition(".")[0]
+    return None
+
+
+class SamplingFilter(logging.Filter):
+    """Per-logger sampling and token-bucket rate limits, applied before enqueueing."""
+
+    def __init__(self, sample_rates: dict = None, rate_limits: dict = None):
+        super().__init__()
+        self.sample_rates = LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        self.rate_limits = LOG_RATE_LIMITS if rate_limits is None else rate_limits
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record):
+        rate = _lookup(self.sample_rates, record.name)
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            self.dropped += 1
+            return False
+        limit = _lookup(self.rate_limits, record.name)
+        if limit is not None and not self._take(record.name, limit):
+            self.dropped += 1
+            return False
+        return True
+
+    def _take(self, name: str, per_second: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(name, (per_second, now))
+            tokens = min(per_second, tokens + (now - last) * per_second)
+            if tokens < 1:
+                self._buckets[name] = (tokens, now)
+                return False
+            self._buckets[name] = (tokens - 1, now)
+            return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread; drops instead of waiting when full.
+
+    Formatting happens on the listener thread. Only what depends on the
+    request thread is resolved here: the message arguments, the exception
+    text and the current request id.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LogPipeline:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(SamplingFilter())
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, output, respect_handler_level=True)
+        self.started = False
+
+    def start(self):
+        """Route the "app" logger tree through the queue. Safe to call twice."""
+        if self.started:
+            return
+        logger = logging.getLogger("app")
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+        self.listener.start()
+        self.started = True
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        if not self.started:
+            return
+        self.listener.stop()
+        logger = logging.getLogger("app")
+        logger.removeHandler(self.handler)
+        logger.propagate = True
+        self.started = False
+
+
+log_pipeline = LogPipeline()
+
+
+class RequestIdMiddleware:
+    """Tag each request with X-Request-ID (taken from the client or generated)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,17 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from jose import jwt
 from fastapi.security import HTTPBearer
+import asyncio
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-import hashlib
 
 # Import from modules
-from app.database import get_db, engine, SessionLocal
-from app.models import Base, User, Category, Task
+from app import database
+from app.config import Settings, settings as env_settings
+from app.database import app_database, get_async_db, get_db, get_read_db
+from app.migrations import migrate
+from app.models import ArchivedTask, User, Category, Task
 from app import schemas
+from app.profiling import ProfilingMiddleware, phase
+from app.instrumentation import QueryStatsMiddleware, query_budget, query_metrics
+from app.logging_pipeline import RequestIdMiddleware, log_pipeline
+from app.compression import CompressionMiddleware
+from app.admission import AdmissionMiddleware, admission_metrics
+from app.hashing import hash_password, hashing_pool, verify_password
+from app.group_commit import GroupCommitWriter, group_commit
+from app.idempotency import REPLAY_HEADER, expire_responses, find_response, fingerprint, idempotency_key, run_once, save_response
+from app.principal_cache import Principal, principal_cache, resolve_principal, resolve_principal_async
+from app.async_routes import build_router, use_async_routes
+from app.export import EXPORTERS, MEDIA_TYPES
+from app.etag import bump_version, conditional, current_version
+from app.events import broker, event_stream, queue_event
+from app.stats import apply_deltas, get_stats, record_change, stat_key
+from app.search import search_tasks
+from app.board import BOARD_GROUP_SIZE, MAX_BOARD_GROUP_SIZE, load_board
+from app.archive import (
+    ARCHIVE_INTERVAL_MINUTES, archive_periodically, archived, paginate_with_archived, task_conditions, unarchive_tasks
+)
+from app.sync import changes_since, purge_tombstones, record_deletions
+from app.projections import (
+    CATEGORY_LIST_COLUMNS, TASK_DETAIL_COLUMNS, TASK_DUE_COLUMNS, TASK_LIST_COLUMNS,
+    category_item, fast_json, task_detail, task_due_item, task_list_item, task_projection
+)
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_tasks, split_page
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 # JWT Configuration
 SECRET_KEY = "your-secret-key-change-in-production"
@@ -19,11 +52,35 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 security = HTTPBearer()
 
-app = FastAPI(
-    title="Task Management API",
-    description="A simplified Trello/Asana-like REST API",
-    version="1.0.0"
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_pipeline.start()
+    db_state = app.state.database
+    # Schema setup waits for startup so importing the app never opens the database
+    migrate(db_state.engine)
+    with db_state.SessionLocal() as db:
+        purge_tombstones(db)
+        expire_responses(db)
+        db.commit()
+    archiver = None
+    if ARCHIVE_INTERVAL_MINUTES:
+        archiver = asyncio.create_task(archive_periodically(db_state.SessionLocal))
+    yield
+    if archiver:
+        archiver.cancel()
+    app.state.group_commit.stop()
+    if db_state is not database.default:
+        await db_state.dispose()
+        return
+    # Process-wide, so only the default app may stop them
+    hashing_pool.shutdown()
+    log_pipeline.stop()
+
+router = APIRouter()
+
+def get_writer(request: Request) -> GroupCommitWriter:
+    """The group-commit writer of the app serving `request`."""
+    return request.app.state.group_commit
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -31,45 +88,60 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(credentials: str = Depends(security), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
+def get_current_user(credentials: str = Depends(security), db: Session = Depends(get_read_db)):
+    with phase("auth"):
+        return resolve_principal(credentials.credentials, SECRET_KEY, ALGORITHM, db)
+
+async def get_current_user_async(credentials: str = Depends(security), db=Depends(get_async_db)):
+    with phase("auth"):
+        return await resolve_principal_async(credentials.credentials, SECRET_KEY, ALGORITHM, db)
 
-@app.get("/")
+@router.get("/")
 def root():
     return {"message": "Task Management API"}
 
-@app.post("/register")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+@router.get("/metrics")
+def metrics(request: Request):
+    return {
+        "queries": query_metrics.snapshot(),
+        "principal_cache": principal_cache.stats(),
+        "hashing": {"rejected": hashing_pool.rejected},
+        "events": broker.stats(),
+        "group_commit": get_writer(request).stats(),
+        "admission": admission_metrics.snapshot(),
+    }
+
+@router.post("/register")
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    # async so KDF work waits on the hashing pool without holding a thread;
+    # the short DB calls still run in the threadpool
     try:
-        print(f" Registering: {user.email}")
+        logger.info("registering user", extra={"email": user.email})
         
         # Check if user exists
-        existing_user = db.query(User).filter(User.email == user.email).first()
+        def lookup():
+            existing = db.query(User.id).filter(User.email == user.email).first()
+            # Hand the connection back instead of holding it through the hash
+            db.close()
+            return existing
+        existing_user = await run_in_threadpool(lookup)
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        # hashing
-        hashed_password = hashlib.sha256(user.password.encode()).hexdigest()
-        print(f" Password hashed: {hashed_password[:20]}...")
+        hashed_password = await hash_password(user.password)
         
         # Create user
-        db_user = User(email=user.email, hashed_password=hashed_password)
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        def create():
+            db_user = User(email=user.email, hashed_password=hashed_password)
+            db.add(db_user)
+            db.commit()
+            db.refresh(db_user)
+            return db_user
+        db_user = await run_in_threadpool(create)
+        # Drop any identity cached for a previous account with this email
+        principal_cache.invalidate_user(email=db_user.email)
         
-        print(f" User created: {db_user.id}")
+        logger.info("user created", extra={"user_id": db_user.id})
         return {
             "email": db_user.email,
             "id": db_user.id,
@@ -79,135 +151,436 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f" Registration error: {str(e)}")
+        logger.exception("registration failed")
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
-@app.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
+@router.post("/login")
+async def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
     try:
-        print(f" Login attempt: {user.email}")
+        logger.info("login attempt", extra={"email": user.email})
         
-        db_user = db.query(User).filter(User.email == user.email).first()
+        def lookup():
+            found = db.query(User.id, User.hashed_password).filter(User.email == user.email).first()
+            # Hand the connection back instead of holding it through the check
+            db.close()
+            return found
+        db_user = await run_in_threadpool(lookup)
         if not db_user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        # Verify password
-        test_hash = hashlib.sha256(user.password.encode()).hexdigest()
-        if test_hash != db_user.hashed_password:
+        # Verify password, upgrading legacy SHA-256 hashes to bcrypt on success
+        valid, new_hash = await verify_password(user.password, db_user.hashed_password)
+        if not valid:
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        if new_hash:
+            def rehash():
+                db.execute(update(User).where(User.id == db_user.id).values(hashed_password=new_hash))
+                db.commit()
+            await run_in_threadpool(rehash)
         
         # Create JWT token
-        access_token = create_access_token(data={"sub": db_user.email})
-        print(f" Login successful: {db_user.email}")
+        access_token = create_access_token(data={"sub": user.email})
+        logger.info("login succeeded", extra={"email": user.email})
         
         return {
             "access_token": access_token,
             "token_type": "bearer",
-            "email": db_user.email
+            "email": user.email
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f" Login error: {str(e)}")
+        logger.exception("login failed")
         raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
 
 # Protected endpoints
-@app.post("/categories")
+@router.post("/categories")
+@query_budget(6)
 def create_category(
     category: schemas.CategoryCreate,  
+    response: Response,
     db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user),
+    key: str = Depends(idempotency_key)
 ):
+    request_fingerprint = fingerprint("POST", "/categories", category)
+    if key:
+        stored = find_response(db, current_user.id, key, request_fingerprint)
+        if stored is not None:
+            response.headers[REPLAY_HEADER] = "true"
+            return stored
     try:
         db_category = Category(name=category.name, user_id=current_user.id)
         db.add(db_category)
+        bump_version(db, current_user.id)
+        db.flush()
+        created = {"id": db_category.id, "name": db_category.name, "user_id": db_category.user_id}
+        if key:
+            save_response(db, current_user.id, key, request_fingerprint, created)
         db.commit()
-        db.refresh(db_category)
-        return {"id": db_category.id, "name": db_category.name, "user_id": db_category.user_id}
+        return created
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/categories")
-def list_categories(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    categories = db.query(Category).filter(Category.user_id == current_user.id).all()
-    return [{"id": cat.id, "name": cat.name} for cat in categories]
+@router.get("/categories")
+@query_budget(3)
+def list_categories(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    cached = conditional(request, response, current_user.id, current_version(db, current_user.id))
+    if cached:
+        return cached
+    categories = db.query(*CATEGORY_LIST_COLUMNS).filter(Category.user_id == current_user.id).all()
+    return fast_json([category_item(cat) for cat in categories], response)
 
-@app.post("/tasks")
-def create_task(
-    task: schemas.TaskCreate,  
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+@router.get("/board")
+@query_budget(3)
+def board(
+    request: Request,
+    response: Response,
+    per_group: int = Query(BOARD_GROUP_SIZE, ge=1, le=MAX_BOARD_GROUP_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Every category with its tasks grouped by status, in one query.
+
+    Each group lists its first `per_group` tasks by creation time and
+    carries the group's full count.
+    """
+    cached = conditional(request, response, current_user.id, current_version(db, current_user.id))
+    if cached:
+        return cached
+    return fast_json({"columns": load_board(db, current_user.id, per_group)}, response)
+
+def insert_task(db: Session, user_id: int, task: schemas.TaskCreate):
+    db_task = Task(
+        title=task.title,
+        description=task.description,
+        status=task.status,
+        due_date=task.due_date,
+        category_id=task.category_id,
+        user_id=user_id
+    )
+    db.add(db_task)
+    # The INSERT hands back the id; everything else is already known
+    db.flush()
+    record_change(db, user_id, new_key=stat_key(task.category_id, task.status))
+    bump_version(db, user_id)
+    queue_event(db, user_id, "task.created", [db_task.id])
+    return {
+        "id": db_task.id,
+        "title": task.title,
+        "description": task.description,
+        "status": task.status,
+        "category_id": task.category_id,
+        "user_id": user_id
+    }
+
+async def write_once(writer: GroupCommitWriter, response: Response, key: str, request_fingerprint: str,
+                     write, user_id: int, *args):
+    """Queue `write` on the group-commit writer, replaying the stored
+    response instead when `key` was already used."""
+    result, replayed = await writer.run(run_once, user_id, key, request_fingerprint, write, *args)
+    if replayed:
+        response.headers[REPLAY_HEADER] = "true"
+    return result
+
+@router.post("/tasks")
+@query_budget(6)
+async def create_task(
+    task: schemas.TaskCreate,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    key: str = Depends(idempotency_key),
+    writer: GroupCommitWriter = Depends(get_writer)
 ):
     try:
-        print(f"Creating task: {task.title}")
-        db_task = Task(
-            title=task.title,
-            description=task.description,
-            status=task.status,
-            category_id=task.category_id,
-            user_id=current_user.id
-        )
-        db.add(db_task)
-        db.commit()
-        db.refresh(db_task)
-        return {
-            "id": db_task.id,
-            "title": db_task.title,
-            "description": db_task.description,
-            "status": db_task.status,
-            "category_id": db_task.category_id,
-            "user_id": db_task.user_id
-        }
+        created = await write_once(writer, response, key, fingerprint("POST", "/tasks", task), insert_task, current_user.id, task)
+        logger.info("task created", extra={"task_id": created["id"], "user_id": current_user.id})
+        return created
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error creating task: {e}")
+        logger.exception("task creation failed")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/tasks")
+@router.get("/tasks")
+@query_budget(3)
 def list_tasks(
+    request: Request,
+    response: Response,
     status: str = None,
     category_id: int = None,
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    due_before: datetime = None,
+    due_after: datetime = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    fields: str = Query(None, description="Comma-separated task fields to return, e.g. id,title"),
+    include_archived: bool = False,
+    db: Session = Depends(get_read_db), 
+    current_user: Principal = Depends(get_current_user)
 ):
-    query = db.query(Task).filter(Task.user_id == current_user.id)
-    
-    if status:
-        query = query.filter(Task.status == status)
-    if category_id:
-        query = query.filter(Task.category_id == category_id)
-    
-    tasks = query.all()
+    columns, serialize = task_projection(fields, TASK_LIST_COLUMNS, task_list_item, "id", "created_at")
+    cached = conditional(request, response, current_user.id, current_version(db, current_user.id))
+    if cached:
+        return cached
+
+    filters = dict(
+        user_id=current_user.id, status=status, category_id=category_id, due_before=due_before, due_after=due_after
+    )
+    if include_archived:
+        rows = db.execute(paginate_with_archived(columns, limit, cursor, **filters)).all()
+        tasks, next_cursor = split_page(rows, limit)
+    else:
+        query = db.query(*columns).filter(*task_conditions(Task, **filters))
+        tasks, next_cursor = paginate_tasks(query, Task, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return fast_json([serialize(task) for task in tasks], response)
+
+@router.get("/tasks/export")
+def export_tasks(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: str = None,
+    category_id: int = None,
+    due_before: datetime = None,
+    due_after: datetime = None,
+    include_archived: bool = False,
+    current_user: Principal = Depends(get_current_user)
+):
+    rows = EXPORTERS[format](
+        app_database(request).ReadSessionLocal, current_user.id, include_archived=include_archived,
+        status=status, category_id=category_id, due_before=due_before, due_after=due_after
+    )
+    return StreamingResponse(
+        rows,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'}
+    )
+
+@router.get("/tasks/stream")
+def stream_tasks(current_user: Principal = Depends(get_current_user)):
+    """Server-Sent Events for the caller's task.created/updated/deleted changes.
+
+    Each event carries the affected ids. An "overflow" event means the
+    client fell too far behind and should refetch GET /tasks.
+    """
+    return StreamingResponse(
+        event_stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/tasks/changes")
+@query_budget(3)
+def task_changes(
+    since: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    return fast_json(changes_since(db, current_user.id, since, limit))
+
+@router.get("/tasks/due")
+@query_budget(2)
+def due_tasks(
+    response: Response,
+    within: timedelta = Query(timedelta(days=1), description="ISO 8601 duration or seconds, e.g. P7D"),
+    overdue: bool = True,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    fields: str = Query(None, description="Comma-separated task fields to return, e.g. id,title"),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Unfinished tasks due within `within` from now, soonest first.
+
+    Overdue tasks come first unless overdue=false. Pages follow
+    X-Next-Cursor like GET /tasks, but ordered by (due_date, id).
+    """
+    columns, serialize = task_projection(fields, TASK_DUE_COLUMNS, task_due_item, "id", "due_date")
+    now = datetime.utcnow()
+    query = db.query(*columns).filter(
+        Task.user_id == current_user.id,
+        Task.due_date < now + within,
+        Task.status != "completed"
+    )
+    if not overdue:
+        query = query.filter(Task.due_date >= now)
+
+    tasks, next_cursor = paginate_tasks(query, Task, limit, cursor, key="due_date")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return fast_json([serialize(task) for task in tasks], response)
+
+@router.get("/tasks/stats")
+@query_budget(2)
+def task_stats(db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
+    return get_stats(db, current_user.id)
+
+@router.get("/tasks/search")
+@query_budget(2)
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    rows = search_tasks(db, current_user.id, q, limit + 1, offset)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
     return [{
-        "id": task.id,
-        "title": task.title,
-        "status": task.status,
-        "category_id": task.category_id
-    } for task in tasks]
+        "id": row.id,
+        "title": row.title,
+        "status": row.status,
+        "category_id": row.category_id
+    } for row in rows]
 
-@app.get("/tasks/{task_id}")
-def get_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return {
-        "id": task.id,
+# Bulk endpoints: one transaction and set-based SQL per batch
+BULK_ID_CHUNK = 500
+
+def owned_tasks(db: Session, user_id: int, ids):
+    """Map each of the caller's task ids to its current stats key."""
+    owned = {}
+    ids = list(set(ids))
+    for i in range(0, len(ids), BULK_ID_CHUNK):
+        chunk = ids[i:i + BULK_ID_CHUNK]
+        rows = db.query(Task.id, Task.category_id, Task.status).filter(Task.user_id == user_id, Task.id.in_(chunk))
+        owned.update((row.id, stat_key(row.category_id, row.status)) for row in rows)
+    return owned
+
+def insert_tasks(db: Session, user_id: int, batch: schemas.TaskBulkCreate):
+    rows = [{
         "title": task.title,
         "description": task.description,
         "status": task.status,
-        "category_id": task.category_id
+        "due_date": task.due_date,
+        "category_id": task.category_id,
+        "user_id": user_id
+    } for task in batch.tasks]
+    stmt = insert(Task).returning(Task.id, sort_by_parameter_order=True)
+    ids = db.scalars(stmt, rows).all()
+    apply_deltas(db, user_id, Counter(stat_key(row["category_id"], row["status"]) for row in rows))
+    bump_version(db, user_id)
+    queue_event(db, user_id, "task.created", ids)
+    return {
+        "created": len(ids),
+        "results": [{"index": i, "id": task_id, "status": 201} for i, task_id in enumerate(ids)]
+    }
+
+# Bulk writes go through the group-commit writer too, so their timestamps
+# follow commit order and /tasks/changes tokens never skip past them
+async def run_bulk(writer: GroupCommitWriter, write, user_id: int, batch):
+    try:
+        return await writer.run(write, user_id, batch)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/tasks/bulk")
+async def bulk_create_tasks(
+    batch: schemas.TaskBulkCreate,
+    current_user: Principal = Depends(get_current_user),
+    writer: GroupCommitWriter = Depends(get_writer)
+):
+    return await run_bulk(writer, insert_tasks, current_user.id, batch)
+
+def apply_bulk_update(db: Session, user_id: int, batch: schemas.TaskBulkUpdate):
+    owned = owned_tasks(db, user_id, [item.id for item in batch.tasks])
+    now = datetime.utcnow()
+    results = []
+    rows = []
+    deltas = Counter()
+    for item in batch.tasks:
+        if item.id not in owned:
+            results.append({"id": item.id, "status": 404})
+            continue
+        # Like PUT /tasks/{id}, fields sent as null are left unchanged
+        changes = {k: v for k, v in item.dict(exclude_unset=True).items() if v is not None}
+        old_key = owned[item.id]
+        new_key = stat_key(changes.get("category_id", old_key[0]), changes.get("status", old_key[1]))
+        deltas[old_key] -= 1
+        deltas[new_key] += 1
+        owned[item.id] = new_key
+        changes["updated_at"] = now
+        rows.append(changes)
+        results.append({"id": item.id, "status": 200})
+    if rows:
+        db.execute(update(Task), rows)
+        apply_deltas(db, user_id, deltas)
+        bump_version(db, user_id)
+        queue_event(db, user_id, "task.updated", [row["id"] for row in rows])
+    return {"updated": len(rows), "results": results}
+
+@router.patch("/tasks/bulk")
+async def bulk_update_tasks(
+    batch: schemas.TaskBulkUpdate,
+    current_user: Principal = Depends(get_current_user),
+    writer: GroupCommitWriter = Depends(get_writer)
+):
+    return await run_bulk(writer, apply_bulk_update, current_user.id, batch)
+
+def remove_tasks(db: Session, user_id: int, batch: schemas.TaskBulkDelete):
+    owned = owned_tasks(db, user_id, batch.ids)
+    doomed = list(owned)
+    for i in range(0, len(doomed), BULK_ID_CHUNK):
+        db.execute(
+            delete(Task).where(Task.id.in_(doomed[i:i + BULK_ID_CHUNK])),
+            execution_options={"synchronize_session": False}
+        )
+    if owned:
+        apply_deltas(db, user_id, Counter({key: -count for key, count in Counter(owned.values()).items()}))
+        bump_version(db, user_id)
+        record_deletions(db, user_id, doomed)
+        queue_event(db, user_id, "task.deleted", doomed)
+    return {
+        "deleted": len(owned),
+        "results": [{"id": task_id, "status": 200 if task_id in owned else 404} for task_id in batch.ids]
     }
 
-@app.put("/tasks/{task_id}")
-def update_task(
+@router.delete("/tasks/bulk")
+async def bulk_delete_tasks(
+    batch: schemas.TaskBulkDelete,
+    current_user: Principal = Depends(get_current_user),
+    writer: GroupCommitWriter = Depends(get_writer)
+):
+    return await run_bulk(writer, remove_tasks, current_user.id, batch)
+
+@router.get("/tasks/{task_id}")
+@query_budget(3)
+def get_task(
     task_id: int,
-    task_update: schemas.TaskUpdate,  
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    fields: str = Query(None, description="Comma-separated task fields to return, e.g. id,title"),
+    include_archived: bool = False,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == current_user.id).first()
+    columns, serialize = task_projection(fields, TASK_DETAIL_COLUMNS, task_detail)
+    task = db.query(*columns).filter(Task.id == task_id, Task.user_id == current_user.id).first()
+    if not task and include_archived:
+        task = db.query(*archived(columns)).filter(
+            ArchivedTask.id == task_id, ArchivedTask.user_id == current_user.id
+        ).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return fast_json(serialize(task))
+
+def apply_task_update(db: Session, user_id: int, task_id: int, task_update: schemas.TaskUpdate):
+    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    old_key = stat_key(task.category_id, task.status)
     
     if task_update.title is not None:
         task.title = task_update.title
@@ -215,10 +588,15 @@ def update_task(
         task.status = task_update.status
     if task_update.description is not None:
         task.description = task_update.description
+    if task_update.due_date is not None:
+        task.due_date = task_update.due_date
     if task_update.category_id is not None:
         task.category_id = task_update.category_id
-        
-    db.commit()
+    new_key = stat_key(task.category_id, task.status)
+    if new_key != old_key:
+        record_change(db, user_id, old_key, new_key)
+    bump_version(db, user_id)
+    queue_event(db, user_id, "task.updated", [task.id])
     return {
         "message": "Task updated", 
         "task_id": task.id,
@@ -226,11 +604,79 @@ def update_task(
         "status": task.status
     }
 
+@router.put("/tasks/{task_id}")
+@query_budget(8)
+async def update_task(
+    task_id: int,
+    task_update: schemas.TaskUpdate,  
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    key: str = Depends(idempotency_key),
+    writer: GroupCommitWriter = Depends(get_writer)
+):
+    request_fingerprint = fingerprint("PUT", f"/tasks/{task_id}", task_update)
+    return await write_once(writer, response, key, request_fingerprint, apply_task_update, current_user.id, task_id, task_update)
 
-@app.delete("/tasks/{task_id}")
-def delete_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == current_user.id).first()
+def remove_task(db: Session, user_id: int, task_id: int):
+    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db.delete(task)
\ No newline at end of file
+    db.delete(task)
+    record_change(db, user_id, old_key=stat_key(task.category_id, task.status))
+    bump_version(db, user_id)
+    record_deletions(db, user_id, [task.id])
+    queue_event(db, user_id, "task.deleted", [task.id])
+    return {"message": "Task deleted"}
+
+@router.delete("/tasks/{task_id}")
+@query_budget(8)
+async def delete_task(
+    task_id: int,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    key: str = Depends(idempotency_key),
+    writer: GroupCommitWriter = Depends(get_writer)
+):
+    request_fingerprint = fingerprint("DELETE", f"/tasks/{task_id}")
+    return await write_once(writer, response, key, request_fingerprint, remove_task, current_user.id, task_id)
+
+def restore_task(db: Session, user_id: int, task_id: int):
+    if not unarchive_tasks(db, user_id, [task_id]):
+        raise HTTPException(status_code=404, detail="Archived task not found")
+    return {"message": "Task unarchived", "task_id": task_id}
+
+@router.post("/tasks/{task_id}/unarchive")
+@query_budget(6)
+async def unarchive_task(
+    task_id: int,
+    current_user: Principal = Depends(get_current_user),
+    writer: GroupCommitWriter = Depends(get_writer)
+):
+    return await writer.run(restore_task, current_user.id, task_id)
+
+def create_app(settings: Settings = None) -> FastAPI:
+    """Build the API for `settings`, by default the ones read from the environment."""
+    settings = settings or env_settings
+    db_state = database.default if settings is database.default.settings else database.Database(settings)
+
+    app = FastAPI(
+        title="Task Management API",
+        description="A simplified Trello/Asana-like REST API",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    app.state.database = db_state
+    app.state.group_commit = group_commit if db_state is database.default else GroupCommitWriter(db_state.SessionLocal)
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    # Resolves routes lazily, so it sees the async routes swapped in below
+    app.add_middleware(AdmissionMiddleware, router=app.router, secret=SECRET_KEY, algorithm=ALGORITHM)
+    app.add_middleware(RequestIdMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    app.include_router(router)
+    if settings.db_mode == "async":
+        use_async_routes(app, build_router(get_current_user_async))
+    return app
+
+app = create_app()
@@ -0,0 +1,142 @@
+import argparse
+import logging
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app.database import begin_immediate, is_sqlite, upsert_insert
+from app.models import ArchivedTask, Base, IdempotencyKey, SchemaVersion, Task, TaskTombstone
+from app.search import SEARCH_DDL, ensure_search_index
+from app.stats import ensure_stats
+
+logger = logging.getLogger(__name__)
+
+
+def initial_schema(engine):
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    with Session(engine) as db:
+        ensure_stats(db)
+
+
+def create_index(engine, table, name):
+    index = next(index for index in table.indexes if index.name == name)
+    index.create(bind=engine, checkfirst=True)
+
+
+def due_date_index(engine):
+    # create_all() only adds indexes along with their table
+    create_index(engine, Task.__table__, "ix_tasks_user_due_id")
+
+
+def delta_sync(engine):
+    create_index(engine, Task.__table__, "ix_tasks_user_updated_id")
+    TaskTombstone.__table__.create(bind=engine, checkfirst=True)
+
+
+def idempotency_keys(engine):
+    IdempotencyKey.__table__.create(bind=engine, checkfirst=True)
+
+
+def task_archive(engine):
+    ArchivedTask.__table__.create(bind=engine, checkfirst=True)
+
+
+def pagination_indexes(engine):
+    # Databases created before keyset pagination never got these
+    for name in ("ix_tasks_user_created_id", "ix_tasks_user_status_created_id", "ix_tasks_user_category_created_id"):
+        create_index(engine, Task.__table__, name)
+    # Superseded: they could filter but not return rows in page order
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_tasks_user_status_id"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_tasks_user_category_id"))
+
+
+def task_autoincrement(engine):
+    """Rebuild tasks with AUTOINCREMENT so archived and deleted ids stay unused.
+
+    Without it SQLite hands out max(id) + 1, which can be the id of an
+    archived task or a tombstone. Other databases never reuse ids.
+    """
+    if not is_sqlite(str(engine.url)):
+        return
+    with engine.begin() as conn:
+        # One transaction, so a second worker waits and then finds it done
+        begin_immediate(conn)
+        schema = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'")).scalar()
+        if "AUTOINCREMENT" in schema.upper():
+            return
+        conn.execute(text("ALTER TABLE tasks RENAME TO tasks_old"))
+        # The renamed table keeps its index names, so free them first
+        for index in Task.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        Task.__table__.create(bind=conn)
+        columns = ", ".join(column.name for column in Task.__table__.columns)
+        conn.execute(text(f"INSERT INTO tasks ({columns}) SELECT {columns} FROM tasks_old"))
+        # Dropping it drops the search triggers, which moved with the rename;
+        # the FTS rows themselves still match since every id is kept
+        conn.execute(text("DROP TABLE tasks_old"))
+        for statement in SEARCH_DDL:
+            conn.execute(text(statement))
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'tasks'"))
+        conn.execute(text("""
+            INSERT INTO sqlite_sequence (name, seq) SELECT 'tasks', coalesce(max(id), 0) FROM (
+                SELECT max(id) AS id FROM tasks
+                UNION ALL SELECT max(id) FROM archived_tasks
+                UNION ALL SELECT max(task_id) FROM task_tombstones
+            )
+        """))
+
+
+# Append only. Two workers starting on a fresh database may both apply a
+# step, so every step has to be safe to run again.
+MIGRATIONS = [
+    (1, initial_schema),
+    (2, due_date_index),
+    (3, delta_sync),
+    (4, idempotency_keys),
+    (5, task_archive),
+    (6, pagination_indexes),
+    (7, task_autoincrement),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(engine) -> int:
+    if not inspect(engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def migrate(engine) -> int:
+    """Apply pending migrations and return the schema version.
+
+    When the schema is already current this costs two cheap queries and
+    no DDL, so it can run on every worker start.
+    """
+    version = current_version(engine)
+    for target, step in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info("applying migration", extra={"version": target, "migration": step.__name__})
+        step(engine)
+        with Session(engine) as db:
+            db.execute(upsert_insert(db)(SchemaVersion).values(version=target).on_conflict_do_nothing())
+            db.commit()
+        version = target
+    return version
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(description="Bring the database schema up to date")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        print(f"Schema at version {migrate(engine)}")
+    else:
+        print(f"Schema at version {current_version(engine)} of {LATEST_VERSION}")
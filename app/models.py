@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -39,4 +39,89 @@ class Task(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     owner = relationship("User", back_populates="tasks")
-    category = relationship("Category", back_populates="tasks")
\ No newline at end of file
+    category = relationship("Category", back_populates="tasks")
+
+    __table_args__ = (
+        # Filtered pages are ordered by (created_at, id), so the order
+        # columns follow each filter column
+        Index("ix_tasks_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_tasks_user_status_created_id", "user_id", "status", "created_at", "id"),
+        Index("ix_tasks_user_category_created_id", "user_id", "category_id", "created_at", "id"),
+        Index("ix_tasks_user_due_id", "user_id", "due_date", "id"),
+        Index("ix_tasks_user_updated_id", "user_id", "updated_at", "id"),
+        # Ids of archived and deleted tasks must never be handed out again
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedTask(Base):
+    """A completed task moved out of tasks by app/archive.py.
+
+    Same columns as Task plus archived_at. Only the (user_id, created_at,
+    id) index is kept, since these rows are only read with include_archived.
+    """
+    __tablename__ = "archived_tasks"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    status = Column(String)
+    due_date = Column(DateTime, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_archived_tasks_user_created_id", "user_id", "created_at", "id"),
+    )
+
+class TaskStat(Base):
+    """Per-user task counts by category and status, kept in step with tasks.
+
+    Uncategorized tasks are counted under category_id 0 so the primary key
+    never contains NULL.
+    """
+    __tablename__ = "task_stats"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category_id = Column(Integer, primary_key=True, default=0)
+    status = Column(String, primary_key=True, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ChangeVersion(Base):
+    """Monotonic per-user counter bumped by every mutation, used for ETags."""
+    __tablename__ = "change_versions"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class TaskTombstone(Base):
+    """A deleted task, kept for delta sync until the retention window passes.
+
+    The primary key is the whole row and SQLite stores it without a rowid,
+    so a tombstone costs one compact index entry.
+    """
+    __tablename__ = "task_tombstones"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    deleted_at = Column(DateTime, primary_key=True)
+    task_id = Column(Integer, primary_key=True, autoincrement=False)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
+class IdempotencyKey(Base):
+    """The response to a write sent with an Idempotency-Key, kept for replays."""
+    __tablename__ = "idempotency_keys"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # sha256 of method, path and payload, so a reused key can be told apart
+    fingerprint = Column(String(64), nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+class SchemaVersion(Base):
+    """One row per migration in app/migrations.py that has been applied."""
+    __tablename__ = "schema_versions"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
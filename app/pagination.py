@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), task_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_cursor(query, model, limit: int, cursor: str = None, key: str = "created_at"):
+    """Order a Query or Select by (key, id) and seek past the cursor.
+
+    `key` must be a non-null datetime column. Fetches one extra row so
+    split_page() knows whether another page exists.
+    """
+    column = getattr(model, key)
+    if cursor:
+        value, task_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            column > value,
+            and_(column == value, model.id > task_id),
+        ))
+    return query.order_by(column, model.id).limit(limit + 1)
+
+
+def split_page(rows, limit: int, key: str = "created_at"):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], key), rows[-1].id)
+    return rows, next_cursor
+
+
+def paginate_tasks(query, model, limit: int, cursor: str = None, key: str = "created_at"):
+    """Apply keyset pagination ordered by (key, id), created_at by default.
+
+    Returns the rows of the page and the cursor for the next one, or
+    None when there are no more rows.
+    """
+    rows = apply_cursor(query, model, limit, cursor, key).all()
+    return split_page(rows, limit, key)
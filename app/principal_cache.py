@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import User
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identity of an authenticated user, detached from any DB session."""
+    id: int
+    email: str
+
+
+class PrincipalCache:
+    """Bounded TTL + LRU map from a verified token to its Principal.
+
+    Entries never outlive the token's own `exp` claim, so a cached hit is
+    exactly as valid as re-verifying the signature would be.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return principal
+
+    def peek(self, key):
+        """Like get(), but leaves the hit counters and LRU order alone."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def set(self, key, principal: Principal, token_exp: float = None):
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[key] = (principal, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int = None, email: str = None):
+        """Drop every cached token that resolves to the given user."""
+        with self._lock:
+            stale = [
+                key for key, (principal, _) in self._entries.items()
+                if principal.id == user_id or principal.email == email
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def _decode_token(token: str, secret_key: str, algorithm: str):
+    try:
+        payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+        email: str = payload.get("sub")
+        if email is None:
+            raise HTTPException(status_code=401, detail="Invalid token")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return email, payload.get("exp")
+
+
+def _remember(key, user, token_exp) -> Principal:
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    principal = Principal(id=user.id, email=user.email)
+    principal_cache.set(key, principal, token_exp)
+    return principal
+
+
+def resolve_principal(token: str, secret_key: str, algorithm: str, db: Session) -> Principal:
+    # Tokens are only valid for the key that signed them, so key on both
+    key = (secret_key, token)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    email, token_exp = _decode_token(token, secret_key, algorithm)
+    user = db.query(User.id, User.email).filter(User.email == email).first()
+    return _remember(key, user, token_exp)
+
+
+async def resolve_principal_async(token: str, secret_key: str, algorithm: str, db: AsyncSession) -> Principal:
+    key = (secret_key, token)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    email, token_exp = _decode_token(token, secret_key, algorithm)
+    result = await db.execute(select(User.id, User.email).where(User.email == email))
+    return _remember(key, result.first(), token_exp)
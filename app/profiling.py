@@ -0,0 +1,168 @@
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PROFILE_SECRET = os.getenv("PROFILE_SECRET")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_HEADER = b"x-profile-token"
+
+_active = ContextVar("active_profile", default=None)
+
+
+def sign_profile_token(secret: str, expires_at: int) -> str:
+    """Token an admin sends in X-Profile-Token to profile one request."""
+    signature = hmac.new(secret.encode(), str(expires_at).encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}:{signature}"
+
+
+def verify_profile_token(secret: str, token: str) -> bool:
+    try:
+        expires_at, _ = token.split(":", 1)
+        expired = int(expires_at) < time.time()
+    except ValueError:
+        return False
+    return not expired and hmac.compare_digest(sign_profile_token(secret, int(expires_at)), token)
+
+
+class RequestProfile:
+    """Stack samples and phase timings for one profiled request."""
+
+    def __init__(self, label: str, interval: float):
+        self.label = label
+        self.interval = interval
+        self.samples = Counter()
+        self.timings = Counter()
+        # Threads known to be doing work for this request; the event loop
+        # thread plus any threadpool worker that reports in through a hook
+        self.threads = {threading.get_ident()}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.timings["total"] = time.perf_counter() - self.started
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[collapse(frame)] += 1
+
+    def add(self, phase: str, seconds: float):
+        self.threads.add(threading.get_ident())
+        self.timings[phase] += seconds
+
+    def split(self):
+        timings = {phase: round(seconds * 1000, 3) for phase, seconds in self.timings.items()}
+        accounted = sum(v for k, v in timings.items() if k != "total")
+        timings["other"] = round(max(timings.get("total", 0) - accounted, 0), 3)
+        return timings
+
+
+def collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def current_profile():
+    return _active.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the wrapped block to a phase of the profiled request, if any."""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+class ProfilingMiddleware:
+    """Sample one request's stacks when asked to, and do nothing otherwise.
+
+    A request is profiled when it carries a valid X-Profile-Token (see
+    sign_profile_token) or is picked by PROFILE_SAMPLE_RATE. The profile is
+    written to PROFILE_DIR as a collapsed-stack .folded file, ready for
+    flamegraph.pl or speedscope, next to a .json file with the phase split,
+    and the split is also returned in a Server-Timing header.
+    """
+
+    def __init__(self, app, secret: str = PROFILE_SECRET, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 output_dir: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.app = app
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000
+
+    def should_profile(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if not self.secret:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return verify_profile_token(self.secret, value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(f"{scope['method']} {scope['path']}", self.interval)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                split = profile.split()
+                split["total"] = round((time.perf_counter() - profile.started) * 1000, 3)
+                timing = ", ".join(f"{name};dur={value}" for name, value in split.items())
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        token = _active.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            profile.stop()
+            _active.reset(token)
+            self.write(profile)
+
+    def write(self, profile: RequestProfile):
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", profile.label).strip("-")
+        base = os.path.join(self.output_dir, f"{int(time.time())}-{slug}-{uuid.uuid4().hex[:8]}")
+        with open(base + ".folded", "w") as fh:
+            for stack, count in profile.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        with open(base + ".json", "w") as fh:
+            json.dump({"request": profile.label, "timings_ms": profile.split(), "samples": sum(profile.samples.values())}, fh)
@@ -0,0 +1,87 @@
+from fastapi import HTTPException, Response
+from fastapi.responses import ORJSONResponse
+
+from app.models import Category, Task
+from app.profiling import phase
+
+# Read endpoints select only these columns and never build ORM entities.
+# created_at is fetched for the keyset cursor but not serialized.
+TASK_LIST_COLUMNS = (Task.id, Task.title, Task.status, Task.category_id, Task.created_at)
+TASK_DETAIL_COLUMNS = (Task.id, Task.title, Task.description, Task.status, Task.category_id)
+TASK_DUE_COLUMNS = (Task.id, Task.title, Task.status, Task.category_id, Task.due_date)
+TASK_SYNC_COLUMNS = (
+    Task.id, Task.title, Task.description, Task.status, Task.due_date, Task.category_id, Task.updated_at
+)
+CATEGORY_LIST_COLUMNS = (Category.id, Category.name)
+
+# What fields= may ask for on task endpoints
+TASK_FIELDS = {
+    column.key: column for column in (
+        Task.id, Task.title, Task.description, Task.status, Task.due_date,
+        Task.category_id, Task.created_at, Task.updated_at
+    )
+}
+
+
+def task_list_item(row):
+    return {"id": row.id, "title": row.title, "status": row.status, "category_id": row.category_id}
+
+
+def task_due_item(row):
+    return {**task_list_item(row), "due_date": row.due_date.isoformat()}
+
+
+def task_detail(row):
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "status": row.status,
+        "category_id": row.category_id
+    }
+
+
+def task_sync_item(row):
+    return {
+        **task_detail(row),
+        "due_date": row.due_date.isoformat() if row.due_date else None,
+        "updated_at": row.updated_at.isoformat(),
+    }
+
+
+def category_item(row):
+    return {"id": row.id, "name": row.name}
+
+
+def task_projection(fields: str, columns: tuple, serialize, *required: str):
+    """Columns to select and the row serializer for an optional fields= value.
+
+    Without `fields` the endpoint's own columns and serializer are used.
+    Otherwise only the named columns are selected, plus `required` ones
+    the query needs itself (such as its cursor key), and only the named
+    ones are returned.
+    """
+    if not fields:
+        return columns, serialize
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in TASK_FIELDS]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Unknown task fields: {', '.join(unknown) or fields!r}")
+    columns = tuple(TASK_FIELDS[name] for name in dict.fromkeys([*names, *required]))
+    return columns, lambda row: {name: getattr(row, name) for name in names}
+
+
+def fast_json(content, response: Response = None) -> ORJSONResponse:
+    """Serialize with orjson, bypassing FastAPI's jsonable_encoder pass.
+
+    A returned Response replaces the injected one, so any headers already
+    set on `response` (ETag, X-Next-Cursor) are carried over.
+    """
+    headers = None
+    if response is not None:
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key not in ("content-length", "content-type")
+        }
+    with phase("serialize"):
+        return ORJSONResponse(content, headers=headers)
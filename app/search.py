@@ -0,0 +1,83 @@
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from app.database import is_sqlite
+from app.models import Task
+
+# External-content FTS5 index over tasks. user_id is indexed as a token so a
+# search intersects the owner's posting list instead of filtering afterwards.
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, user_id,
+        content='tasks', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description, user_id ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+        INSERT INTO tasks_fts(rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END
+    """,
+]
+
+SEARCH_SQL = text("""
+    SELECT tasks.id, tasks.title, tasks.status, tasks.category_id
+    FROM tasks_fts
+    JOIN tasks ON tasks.id = tasks_fts.rowid
+    WHERE tasks_fts MATCH :match
+    ORDER BY bm25(tasks_fts, 10.0, 1.0, 0.0)
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def ensure_search_index(engine):
+    """Create the FTS5 table and its sync triggers, backfilling on first run."""
+    if not is_sqlite(str(engine.url)):
+        return
+    with engine.begin() as conn:
+        existed = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+        )).first()
+        for statement in SEARCH_DDL:
+            conn.execute(text(statement))
+        if not existed:
+            conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+
+def build_match(q: str, user_id: int) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax
+    terms = ['"' + term.replace('"', '""') + '"' for term in q.split()]
+    return f'user_id:"{user_id}" AND {{title description}}: ({" AND ".join(terms)})'
+
+
+def search_tasks(db: Session, user_id: int, q: str, limit: int, offset: int = 0):
+    if not q.split():
+        return []
+    if is_sqlite(str(db.get_bind().url)):
+        return db.execute(SEARCH_SQL, {
+            "match": build_match(q, user_id),
+            "limit": limit,
+            "offset": offset,
+        }).all()
+
+    # Server databases have no FTS5; fall back to an unranked substring scan
+    query = db.query(Task.id, Task.title, Task.status, Task.category_id).filter(Task.user_id == user_id)
+    for term in q.split():
+        pattern = f"%{term}%"
+        query = query.filter(or_(Task.title.ilike(pattern), Task.description.ilike(pattern)))
+    return query.order_by(Task.id).limit(limit).offset(offset).all()
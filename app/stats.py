@@ -0,0 +1,104 @@
+import argparse
+from collections import Counter
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.database import upsert_insert
+from app.models import Task, TaskStat
+
+
+def stat_key(category_id, status):
+    return (category_id or 0, status or "")
+
+
+def apply_deltas(db: Session, user_id: int, deltas: Counter):
+    """Add per-(category, status) deltas to the user's counters.
+
+    Runs inside the caller's transaction, so counters commit or roll back
+    together with the task rows they describe.
+    """
+    rows = [
+        {"user_id": user_id, "category_id": category_id, "status": status, "count": delta}
+        for (category_id, status), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    stmt = upsert_insert(db)(TaskStat)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TaskStat.user_id, TaskStat.category_id, TaskStat.status],
+        set_={"count": TaskStat.count + stmt.excluded["count"]},
+    )
+    db.execute(stmt, rows)
+
+
+def record_change(db: Session, user_id: int, old_key=None, new_key=None):
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_deltas(db, user_id, deltas)
+
+
+def get_stats(db: Session, user_id: int):
+    rows = db.execute(
+        select(TaskStat.category_id, TaskStat.status, TaskStat.count)
+        .where(TaskStat.user_id == user_id, TaskStat.count > 0)
+    ).all()
+    by_status = Counter()
+    by_category = Counter()
+    for category_id, status, count in rows:
+        by_status[status or None] += count
+        by_category[category_id or None] += count
+    return {
+        "total": sum(by_status.values()),
+        "by_status": {status: count for status, count in by_status.items() if status is not None},
+        "by_category": [
+            {"category_id": category_id, "count": count}
+            for category_id, count in sorted(by_category.items(), key=lambda item: item[0] or 0)
+        ],
+    }
+
+
+def rebuild_stats(db: Session, user_id: int = None):
+    """Recompute counters from the tasks table, repairing any drift."""
+    counts = select(Task.user_id, Task.category_id, Task.status, func.count()).group_by(
+        Task.user_id, Task.category_id, Task.status
+    )
+    clear = delete(TaskStat)
+    if user_id is not None:
+        counts = counts.where(Task.user_id == user_id)
+        clear = clear.where(TaskStat.user_id == user_id)
+
+    totals = Counter()
+    for row_user_id, category_id, status, count in db.execute(counts):
+        totals[(row_user_id, stat_key(category_id, status))] += count
+
+    db.execute(clear)
+    if totals:
+        db.execute(TaskStat.__table__.insert(), [
+            {"user_id": row_user_id, "category_id": key[0], "status": key[1], "count": count}
+            for (row_user_id, key), count in totals.items()
+        ])
+    db.commit()
+    return len(totals)
+
+
+def ensure_stats(db: Session):
+    """Backfill counters the first time the table is created on existing data."""
+    if db.query(TaskStat.user_id).first() is None and db.query(Task.id).first() is not None:
+        rebuild_stats(db)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild per-user task counters from the tasks table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", type=int, help="Only rebuild this user's counters")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        rebuilt = rebuild_stats(db, args.user)
+    print(f"Rebuilt {rebuilt} counters")
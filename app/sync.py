@@ -0,0 +1,102 @@
+import argparse
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, insert, or_
+from sqlalchemy.orm import Session
+
+from app.models import Task, TaskTombstone
+from app.projections import TASK_SYNC_COLUMNS, task_sync_item
+
+# Tokens older than this are refused with 410, since the tombstones they
+# would need may already be purged
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+
+
+def encode_token(updated_at: datetime, task_id: int, issued_at: datetime) -> str:
+    raw = json.dumps([updated_at.isoformat(), task_id, issued_at.isoformat()]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        updated_at, task_id, issued_at = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), int(task_id), datetime.fromisoformat(issued_at)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
+def record_deletions(db: Session, user_id: int, task_ids):
+    """Leave tombstones for deleted tasks inside the caller's transaction."""
+    now = datetime.utcnow()
+    rows = [{"user_id": user_id, "deleted_at": now, "task_id": task_id} for task_id in task_ids]
+    if rows:
+        db.execute(insert(TaskTombstone), rows)
+
+
+def purge_tombstones(db: Session, retention_days: int = TOMBSTONE_RETENTION_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    purged = db.execute(delete(TaskTombstone).where(TaskTombstone.deleted_at < cutoff)).rowcount
+    db.commit()
+    return purged
+
+
+def changes_since(db: Session, user_id: int, token: str = None, limit: int = 100) -> dict:
+    """Tasks changed and deleted after the position in `token`.
+
+    Without a token every task is returned, page by page. Pages are
+    ordered by (updated_at, id); the tombstones in a page are the ones up
+    to its last change, so clients apply `deleted` before `changes`.
+    Keep calling with `next` while `has_more` is true.
+    """
+    now = datetime.utcnow()
+    position, last_id = datetime.min, 0
+    if token:
+        position, last_id, issued_at = decode_token(token)
+        if issued_at < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            raise HTTPException(status_code=410, detail="Sync token expired, fetch all tasks again")
+
+    rows = db.query(*TASK_SYNC_COLUMNS).filter(
+        Task.user_id == user_id,
+        or_(Task.updated_at > position, and_(Task.updated_at == position, Task.id > last_id))
+    ).order_by(Task.updated_at, Task.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    tombstones = []
+    if token:
+        query = db.query(TaskTombstone.task_id, TaskTombstone.deleted_at).filter(
+            TaskTombstone.user_id == user_id,
+            TaskTombstone.deleted_at > position
+        )
+        if has_more:
+            query = query.filter(TaskTombstone.deleted_at <= rows[-1].updated_at)
+        tombstones = query.order_by(TaskTombstone.deleted_at).all()
+
+    if rows:
+        position, last_id = rows[-1].updated_at, rows[-1].id
+    if not has_more and tombstones and tombstones[-1].deleted_at > position:
+        position, last_id = tombstones[-1].deleted_at, 0
+
+    return {
+        "changes": [task_sync_item(row) for row in rows],
+        "deleted": [tombstone.task_id for tombstone in tombstones],
+        "next": encode_token(position, last_id, now),
+        "has_more": has_more,
+    }
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain delta-sync tombstones")
+    parser.add_argument("command", choices=["purge"])
+    parser.add_argument("--days", type=int, default=TOMBSTONE_RETENTION_DAYS, help="Keep tombstones this many days")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        print(f"Purged {purge_tombstones(db, args.days)} tombstones")
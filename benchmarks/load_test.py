@@ -0,0 +1,431 @@
+"""Seeded load test that drives every endpoint in-process over ASGI.
+
+    # 1. Build a dataset (deterministic for a given --seed)
+    python benchmarks/load_test.py seed --users 10000 --tasks 5000000 --skew 1.1
+
+    # 2. Drive each endpoint and write a JSON report
+    python benchmarks/load_test.py run --requests 500 --concurrency 32 --output before.json
+
+    # 3. Compare two reports, exiting non-zero on a regression
+    python benchmarks/load_test.py compare before.json after.json --max-regression 0.15
+
+Reports only contain numbers keyed by scenario name plus the settings that
+produced them, so reports from different commits can be diffed directly.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+DEFAULT_DB = os.path.join(ROOT, "benchmarks", "bench.db")
+PASSWORD = "benchpass"
+STATUSES = ("pending", "in_progress", "completed")
+SEED_BATCH = 50000
+
+
+def seed(args):
+    # Only the ORM schema is created here; the run command's migrations
+    # build the search index and counters from the seeded data.
+    from sqlalchemy import create_engine
+    from app.hashing import pwd_context
+    from app.models import Base
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    engine = create_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    rng = random.Random(args.seed)
+    # Zipf-like account sizes: user i gets a share proportional to 1/(i+1)^skew
+    weights = [1 / (i + 1) ** args.skew for i in range(args.users)]
+    scale = args.tasks / sum(weights)
+    sizes = [int(w * scale) for w in weights]
+    sizes[0] += args.tasks - sum(sizes)
+
+    hashed = pwd_context.hash(PASSWORD)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO users (id, email, hashed_password, created_at) VALUES (?, ?, ?, ?)",
+        [(i + 1, f"bench{i + 1}@example.com", hashed, sql_datetime(now)) for i in range(args.users)]
+    )
+    categories = []
+    owned_categories = {}
+    for user_id in range(1, args.users + 1):
+        owned_categories[user_id] = []
+        for c in range(args.categories):
+            category_id = len(categories) + 1
+            owned_categories[user_id].append(category_id)
+            categories.append((category_id, f"category {c}", user_id, sql_datetime(now)))
+    conn.executemany("INSERT INTO categories (id, name, user_id, created_at) VALUES (?, ?, ?, ?)", categories)
+
+    batch = []
+    task_id = 0
+    for user_id, size in enumerate(sizes, start=1):
+        owned = owned_categories[user_id]
+        for _ in range(size):
+            task_id += 1
+            created = now - timedelta(seconds=args.tasks - task_id)
+            due = created + timedelta(days=rng.randint(-30, 60)) if rng.random() < 0.5 else None
+            batch.append((
+                task_id,
+                f"task {task_id} {rng.choice(('report', 'invoice', 'review', 'deploy', 'call'))}",
+                "details " * rng.randint(0, 40),
+                rng.choice(STATUSES),
+                sql_datetime(due) if due else None,
+                user_id,
+                rng.choice(owned) if owned and rng.random() < 0.8 else None,
+                sql_datetime(created),
+                sql_datetime(created),
+            ))
+            if len(batch) >= SEED_BATCH:
+                insert_tasks(conn, batch)
+                batch = []
+    insert_tasks(conn, batch)
+    conn.commit()
+    conn.close()
+    print(json.dumps({"db": args.db, "users": args.users, "tasks": task_id, "largest_account": sizes[0]}))
+
+
+def sql_datetime(value):
+    # Same text format SQLAlchemy's SQLite DateTime type writes and compares
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def insert_tasks(conn, rows):
+    conn.executemany(
+        "INSERT INTO tasks (id, title, description, status, due_date, user_id, category_id, created_at, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Context:
+    """Tokens and task ids for a sample of seeded users."""
+
+    def __init__(self, tokens, task_ids, run_id):
+        self.tokens = tokens
+        self.task_ids = task_ids
+        self.run_id = run_id
+        self.counter = 0
+
+    def user(self, rng):
+        user_id = rng.choice(list(self.tokens))
+        return user_id, {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def unique(self):
+        self.counter += 1
+        return f"{self.run_id}-{self.counter}"
+
+
+async def create_task(client, headers, title="bench task"):
+    response = await client.post("/tasks", json={"title": title}, headers=headers)
+    return response.json()["id"]
+
+
+# Each scenario prepares untimed state and returns the single request to time
+async def s_root(client, ctx, rng):
+    return "GET", "/", {}
+
+async def s_register(client, ctx, rng):
+    return "POST", "/register", {"json": {"email": f"load-{ctx.unique()}@example.com", "password": PASSWORD}}
+
+async def s_login(client, ctx, rng):
+    user_id, _ = ctx.user(rng)
+    return "POST", "/login", {"json": {"email": f"bench{user_id}@example.com", "password": PASSWORD}}
+
+async def s_create_category(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "POST", "/categories", {"json": {"name": f"cat {ctx.unique()}"}, "headers": headers}
+
+async def s_list_categories(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/categories", {"headers": headers}
+
+async def s_board(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/board", {"headers": headers}
+
+async def s_create_task(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "POST", "/tasks", {"json": {"title": f"load {ctx.unique()}"}, "headers": headers}
+
+async def s_list_tasks(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks", {"headers": headers}
+
+async def s_list_tasks_filtered(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks", {"params": {"status": rng.choice(STATUSES)}, "headers": headers}
+
+async def s_list_tasks_archived(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks", {"params": {"include_archived": "true"}, "headers": headers}
+
+async def s_changes(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks/changes", {"params": {"limit": 100}, "headers": headers}
+
+async def s_due(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks/due", {"params": {"within": rng.choice(("P1D", "P7D", "P30D"))}, "headers": headers}
+
+async def s_list_tasks_sparse(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks", {"params": {"fields": "id,title"}, "headers": {**headers, "Accept-Encoding": "br, gzip"}}
+
+async def s_export(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks/export", {"params": {"status": "pending"}, "headers": headers}
+
+async def s_search(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks/search", {"params": {"q": rng.choice(("report", "invoice", "deploy"))}, "headers": headers}
+
+async def s_stats(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "GET", "/tasks/stats", {"headers": headers}
+
+async def s_get_task(client, ctx, rng):
+    user_id, headers = ctx.user(rng)
+    return "GET", f"/tasks/{rng.choice(ctx.task_ids[user_id])}", {"headers": headers}
+
+async def s_update_task(client, ctx, rng):
+    user_id, headers = ctx.user(rng)
+    task_id = rng.choice(ctx.task_ids[user_id])
+    return "PUT", f"/tasks/{task_id}", {"json": {"status": rng.choice(STATUSES)}, "headers": headers}
+
+async def s_delete_task(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    task_id = await create_task(client, headers)
+    return "DELETE", f"/tasks/{task_id}", {"headers": headers}
+
+async def s_bulk_create(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    return "POST", "/tasks/bulk", {"json": {"tasks": [{"title": f"bulk {i}"} for i in range(100)]}, "headers": headers}
+
+async def s_bulk_update(client, ctx, rng):
+    user_id, headers = ctx.user(rng)
+    ids = rng.sample(ctx.task_ids[user_id], min(100, len(ctx.task_ids[user_id])))
+    return "PATCH", "/tasks/bulk", {
+        "json": {"tasks": [{"id": task_id, "status": rng.choice(STATUSES)} for task_id in ids]},
+        "headers": headers
+    }
+
+async def s_bulk_delete(client, ctx, rng):
+    _, headers = ctx.user(rng)
+    response = await client.post("/tasks/bulk", json={"tasks": [{"title": "doomed"}] * 100}, headers=headers)
+    ids = [item["id"] for item in response.json()["results"]]
+    return "DELETE", "/tasks/bulk", {"json": {"ids": ids}, "headers": headers}
+
+
+SCENARIOS = {
+    "GET /": s_root,
+    "POST /register": s_register,
+    "POST /login": s_login,
+    "POST /categories": s_create_category,
+    "GET /categories": s_list_categories,
+    "GET /board": s_board,
+    "POST /tasks": s_create_task,
+    "GET /tasks": s_list_tasks,
+    "GET /tasks?status": s_list_tasks_filtered,
+    "GET /tasks?fields": s_list_tasks_sparse,
+    "GET /tasks?include_archived": s_list_tasks_archived,
+    "GET /tasks/changes": s_changes,
+    "GET /tasks/due": s_due,
+    "GET /tasks/export": s_export,
+    "GET /tasks/search": s_search,
+    "GET /tasks/stats": s_stats,
+    "GET /tasks/{id}": s_get_task,
+    "PUT /tasks/{id}": s_update_task,
+    "DELETE /tasks/{id}": s_delete_task,
+    "POST /tasks/bulk": s_bulk_create,
+    "PATCH /tasks/bulk": s_bulk_update,
+    "DELETE /tasks/bulk": s_bulk_delete,
+}
+
+
+async def drive(client, ctx, scenario, requests, concurrency, seed):
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        for _ in remaining:
+            method, url, kwargs = await scenario(client, ctx, rng)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            # Streaming bodies count as served once fully read
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for code, count in statuses.items() if code >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_async(args):
+    import httpx
+    from sqlalchemy import text
+    from app.main import app, create_access_token
+    from app.database import SessionLocal, engine
+    from app.migrations import migrate
+
+    # ASGITransport does not run the lifespan, so bring the schema up here
+    migrate(engine)
+    rng = random.Random(args.seed)
+    with SessionLocal() as db:
+        user_count = db.execute(text("SELECT count(*) FROM users WHERE email LIKE 'bench%'")).scalar()
+        if not user_count:
+            raise SystemExit(f"No seeded users in {args.db}; run the seed command first")
+        # Always include user 1, the largest account, where regressions hurt most
+        sample = set(rng.sample(range(1, user_count + 1), min(args.sample_users, user_count))) | {1}
+        tokens, task_ids = {}, {}
+        for user_id in sorted(sample):
+            ids = [row[0] for row in db.execute(
+                text("SELECT id FROM tasks WHERE user_id = :u ORDER BY id LIMIT 1000"), {"u": user_id}
+            )]
+            if not ids:
+                continue
+            tokens[user_id] = create_access_token({"sub": f"bench{user_id}@example.com"})
+            task_ids[user_id] = ids
+    ctx = Context(tokens, task_ids, run_id=f"{int(time.time())}-{os.getpid()}")
+
+    selected = args.scenario or list(SCENARIOS)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in selected:
+            results[name] = await drive(client, ctx, SCENARIOS[name], args.requests, args.concurrency, args.seed)
+            print(f"{name:24} {results[name]['throughput_rps']:>10} rps  p99 {results[name]['p99_ms']} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "sample_users": len(tokens),
+        },
+        "results": results,
+    }
+
+
+def run(args):
+    # Point the app at the benchmark database before it is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    # Measure the app, not per-user admission limits tripped by a few sampled users
+    os.environ.setdefault("ADMISSION_RATE", "0")
+    os.environ.setdefault("ADMISSION_USER_INFLIGHT", "0")
+    report = asyncio.run(run_async(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+def compare(args):
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)["results"]
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)["results"]
+
+    regressions = []
+    for name in baseline:
+        if name not in candidate:
+            continue
+        old, new = baseline[name], candidate[name]
+        throughput = new["throughput_rps"] / old["throughput_rps"] - 1 if old["throughput_rps"] else 0.0
+        p99 = new["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+        flag = throughput < -args.max_regression or p99 > args.max_regression
+        if flag:
+            regressions.append(name)
+        print(f"{name:24} throughput {throughput:+7.1%}  p99 {p99:+7.1%}{'  REGRESSION' if flag else ''}")
+    if regressions:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded load test for the Task Management API")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="Create a benchmark SQLite database")
+    p_seed.add_argument("--db", default=DEFAULT_DB)
+    p_seed.add_argument("--users", type=int, default=1000)
+    p_seed.add_argument("--tasks", type=int, default=100000)
+    p_seed.add_argument("--categories", type=int, default=5, help="Categories per user")
+    p_seed.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for account sizes (0 = uniform)")
+    p_seed.add_argument("--seed", type=int, default=42)
+    p_seed.set_defaults(func=seed)
+
+    p_run = sub.add_parser("run", help="Drive every endpoint and report latency percentiles")
+    p_run.add_argument("--db", default=DEFAULT_DB)
+    p_run.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    p_run.add_argument("--concurrency", type=int, default=16)
+    p_run.add_argument("--sample-users", type=int, default=50)
+    p_run.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Only run these scenarios")
+    p_run.add_argument("--seed", type=int, default=42)
+    p_run.add_argument("--output")
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Compare two run reports")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("candidate")
+    p_cmp.add_argument("--max-regression", type=float, default=0.15)
+    p_cmp.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Rows/sec of the ORM read path versus the column-projected orjson path.
+
+Seeds a throwaway SQLite database with one account of N tasks, then reads
+the whole account both ways, including serialization to JSON bytes:
+
+    python benchmarks/read_path.py --tasks 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Task, User
+from app.projections import TASK_LIST_COLUMNS, task_list_item
+
+
+def seed(session, tasks: int):
+    user = User(email="bench@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    now = datetime.utcnow()
+    session.execute(insert(Task), [{
+        "title": f"task {i}",
+        "description": "lorem ipsum " * 20,
+        "status": ("pending", "in_progress", "completed")[i % 3],
+        "user_id": user.id,
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(tasks)])
+    session.commit()
+    return user.id
+
+
+def orm_path(session, user_id):
+    tasks = session.query(Task).filter(Task.user_id == user_id).all()
+    payload = [{
+        "id": task.id,
+        "title": task.title,
+        "status": task.status,
+        "category_id": task.category_id
+    } for task in tasks]
+    return json.dumps(jsonable_encoder(payload)).encode()
+
+
+def projected_path(session, user_id):
+    rows = session.query(*TASK_LIST_COLUMNS).filter(Task.user_id == user_id).all()
+    return orjson.dumps([task_list_item(row) for row in rows])
+
+
+def measure(fn, session_factory, user_id, tasks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        with session_factory() as session:
+            start = time.perf_counter()
+            fn(session, user_id)
+            best = min(best, time.perf_counter() - start)
+    return tasks / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        with session_factory() as session:
+            user_id = seed(session, args.tasks)
+
+        results = {
+            "tasks": args.tasks,
+            "orm_rows_per_sec": round(measure(orm_path, session_factory, user_id, args.tasks, args.repeat)),
+            "projected_rows_per_sec": round(measure(projected_path, session_factory, user_id, args.tasks, args.repeat)),
+        }
+        results["speedup"] = round(results["projected_rows_per_sec"] / results["orm_rows_per_sec"], 2)
+        engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Cold-start benchmark: import time, startup time and first request per worker.
+
+    python benchmarks/startup.py --repeat 10 --max-import-ms 1500
+
+Every sample runs in a fresh interpreter, the way a new worker starts.
+Startup is measured twice: against an empty database, where the schema
+migrations run, and against one already at the latest schema version,
+which is what every worker after the first sees. Importing the app must
+not touch the database at all; the benchmark fails if it does.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r"""
+import asyncio, json, os, time
+import httpx
+
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+touched = os.path.exists(os.environ["BENCH_DB"])
+
+async def main():
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.get("/")).raise_for_status()
+        served = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "startup_ms": (started - imported) * 1000,
+        "first_request_ms": (served - started) * 1000,
+        "import_touched_db": touched,
+    }))
+
+asyncio.run(main())
+"""
+
+
+def sample(db_path: str) -> dict:
+    env = {
+        **os.environ,
+        "BENCH_DB": db_path,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "DATABASE_READ_URL": "",
+        "LOG_LEVEL": "WARNING",
+    }
+    output = subprocess.check_output([sys.executable, "-c", WORKER], cwd=ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(count: int) -> list:
+    """Top modules by cumulative import time, from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "DATABASE_URL": "sqlite://"},
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in sorted(rows, reverse=True)[:count]]
+
+
+def summarize(samples: list, key: str) -> dict:
+    values = [s[key] for s in samples]
+    return {"median": round(statistics.median(values), 1), "max": round(max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="List this many of the slowest imports")
+    parser.add_argument("--max-import-ms", type=float, help="Exit non-zero if the median import is slower")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    fresh, current = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.repeat):
+            db_path = os.path.join(tmp, f"startup-{i}.db")
+            fresh.append(sample(db_path))
+            current.append(sample(db_path))
+
+    report = {
+        "repeat": args.repeat,
+        "import_ms": summarize(fresh + current, "import_ms"),
+        "startup_ms": {
+            "empty_database": summarize(fresh, "startup_ms"),
+            "current_schema": summarize(current, "startup_ms"),
+        },
+        "first_request_ms": summarize(fresh + current, "first_request_ms"),
+        "import_touched_db": any(s["import_touched_db"] for s in fresh),
+        "slowest_imports": slowest_imports(args.top),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+    if report["import_touched_db"]:
+        sys.exit("Importing app.main touched the database")
+    if args.max_import_ms is not None and report["import_ms"]["median"] > args.max_import_ms:
+        sys.exit(f"Median import took {report['import_ms']['median']} ms, budget is {args.max_import_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import sys
 
 sys.path.append(os.path.dirname(__file__))
 from app.database import engine
-from app.models import Base
+from app.migrations import migrate
 
 def reset_database():
 
@@ -11,8 +11,13 @@ def reset_database():
         os.remove("task_manager.db")
         print(" Old database removed")
 
-    Base.metadata.create_all(bind=engine)
-    print(" New database created with all tables")
+    # WAL mode leaves a write-ahead log and shared-memory index next to the file
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists("task_manager.db" + suffix):
+            os.remove("task_manager.db" + suffix)
+
+    version = migrate(engine)
+    print(f" New database created at schema version {version}")
     
     print(" Database has been reset. Please restart your server.")
 
@@ -8,11 +8,14 @@ def install_requirements():
         "fastapi",
         "uvicorn[standard]", 
         "sqlalchemy",
+        "aiosqlite",
         "python-jose[cryptography]",
         "passlib[bcrypt]",
         "pytest",
         "httpx",
-        "email-validator"
+        "email-validator",
+        "orjson",
+        "brotli"
     ]
     
     print("Installing required packages...")
@@ -0,0 +1,4 @@
+import os
+
+# Fail any request that issues more queries than its endpoint's @query_budget
+os.environ.setdefault("QUERY_BUDGET_ENFORCE", "1")
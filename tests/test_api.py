@@ -1,9 +1,16 @@
 from fastapi.testclient import TestClient
 from app.main import app
+import pytest
 import random
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def started_app():
+    # Runs the lifespan: schema migrations and the logging pipeline
+    with client:
+        yield
+
 def test_root_endpoint():
     """Test 1: Root endpoint"""
     response = client.get("/")
@@ -44,4 +51,842 @@ def test_protected_endpoint_without_auth():
     """Test 4: Protected endpoints require auth - accept 401 OR 403"""
     response = client.get("/tasks")
     # Both 401 and 403 mean "not authorized"
-    assert response.status_code in [401, 403]
\ No newline at end of file
+    assert response.status_code in [401, 403]
+
+def auth_headers(test_client=client):
+    """Register a fresh user and return bearer headers for it"""
+    email = f"user{random.randint(100000, 999999)}@example.com"
+    test_client.post("/register", json={"email": email, "password": "simple123"})
+    response = test_client.post("/login", json={"email": email, "password": "simple123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_task_list_cursor_pagination():
+    """Test 5: GET /tasks pages through results with an opaque cursor"""
+    headers = auth_headers()
+    for i in range(5):
+        client.post("/tasks", json={"title": f"task {i}"}, headers=headers)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tasks", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(task["title"] for task in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == [f"task {i}" for i in range(5)]
+
+    response = client.get("/tasks", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+def test_principal_cache_hits_and_invalidation():
+    """Test 6: Repeated requests with one token are served from the principal cache"""
+    from app.principal_cache import principal_cache
+
+    headers = auth_headers()
+    client.get("/categories", headers=headers)
+    hits_before = principal_cache.stats()["hits"]
+    response = client.get("/categories", headers=headers)
+    assert response.status_code == 200
+    assert principal_cache.stats()["hits"] == hits_before + 1
+
+    me = client.post("/tasks", json={"title": "whoami"}, headers=headers).json()
+    assert principal_cache.invalidate_user(user_id=me["user_id"]) == 1
+    assert client.get("/categories", headers=headers).status_code == 200
+
+def test_export_tasks_streams_ndjson_and_csv():
+    """Test 7: GET /tasks/export streams every matching task"""
+    import json
+
+    headers = auth_headers()
+    client.post("/tasks", json={"title": "open"}, headers=headers)
+    client.post("/tasks", json={"title": "done", "status": "completed"}, headers=headers)
+
+    response = client.get("/tasks/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == ["open", "done"]
+
+    response = client.get("/tasks/export", params={"format": "csv", "status": "completed"}, headers=headers)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,title,description,status")
+    assert len(lines) == 2 and ",done," in lines[1]
+
+def test_bulk_create_update_delete():
+    """Test 8: Bulk endpoints apply a whole batch and report per-item results"""
+    headers = auth_headers()
+    response = client.post("/tasks/bulk", json={
+        "tasks": [{"title": f"bulk {i}"} for i in range(3)]
+    }, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["created"] == 3
+    ids = [item["id"] for item in response.json()["results"]]
+
+    response = client.patch("/tasks/bulk", json={
+        "tasks": [{"id": ids[0], "status": "completed"}, {"id": 0, "title": "missing"}]
+    }, headers=headers)
+    assert [item["status"] for item in response.json()["results"]] == [200, 404]
+    assert client.get(f"/tasks/{ids[0]}", headers=headers).json()["status"] == "completed"
+
+    response = client.request("DELETE", "/tasks/bulk", json={"ids": ids[:2]}, headers=headers)
+    assert response.json()["deleted"] == 2
+    remaining = client.get("/tasks", headers=headers).json()
+    assert [task["id"] for task in remaining] == ids[2:]
+
+def test_async_routes_match_sync_payloads():
+    """Test 9: The AsyncSession endpoints serve the same payloads as the sync ones"""
+    from fastapi import FastAPI
+    from app.async_routes import build_router, use_async_routes
+    from app.main import get_current_user_async
+
+    async_app = FastAPI()
+    async_app.include_router(app.router)
+    use_async_routes(async_app, build_router(get_current_user_async))
+
+    headers = auth_headers()
+    with TestClient(async_app) as async_client:
+        created = async_client.post("/tasks", json={"title": "async"}, headers=headers).json()
+        assert async_client.get(f"/tasks/{created['id']}", headers=headers).json() == \
+            client.get(f"/tasks/{created['id']}", headers=headers).json()
+        assert async_client.get("/tasks", headers=headers).json() == client.get("/tasks", headers=headers).json()
+        # Literal routes registered ahead of /tasks/{task_id} keep winning
+        assert async_client.get("/tasks/export", headers=headers).status_code == 200
+        assert async_client.delete(f"/tasks/{created['id']}", headers=headers).status_code == 200
+        assert async_client.get(f"/tasks/{created['id']}", headers=headers).status_code == 404
+
+def test_engine_profiles_split_reads_and_writes():
+    """Test 10: SQLite runs in WAL mode and the read engine refuses writes"""
+    from sqlalchemy import text
+    from app.database import engine, read_engine
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    with read_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+
+def test_search_tasks_ranked_and_scoped():
+    """Test 11: GET /tasks/search finds the caller's tasks and follows edits"""
+    headers = auth_headers()
+    other = auth_headers()
+    client.post("/tasks", json={"title": "quarterly report", "description": "draft"}, headers=headers)
+    task = client.post("/tasks", json={"title": "groceries", "description": "report receipts"}, headers=headers).json()
+    client.post("/tasks", json={"title": "report for someone else"}, headers=other)
+
+    results = client.get("/tasks/search", params={"q": "report"}, headers=headers).json()
+    assert [r["title"] for r in results] == ["quarterly report", "groceries"]
+
+    client.put(f"/tasks/{task['id']}", json={"description": "milk"}, headers=headers)
+    results = client.get("/tasks/search", params={"q": "report"}, headers=headers).json()
+    assert [r["title"] for r in results] == ["quarterly report"]
+
+    # Query syntax characters are treated as plain text
+    assert client.get("/tasks/search", params={"q": 'report" OR *'}, headers=headers).status_code == 200
+
+def test_task_stats_follow_mutations_and_rebuild():
+    """Test 12: GET /tasks/stats tracks every mutation and survives a rebuild"""
+    from app.database import SessionLocal
+    from app.stats import rebuild_stats
+
+    headers = auth_headers()
+    category = client.post("/categories", json={"name": "work"}, headers=headers).json()
+    first = client.post("/tasks", json={"title": "a", "category_id": category["id"]}, headers=headers).json()
+    client.post("/tasks", json={"title": "b"}, headers=headers)
+    client.post("/tasks/bulk", json={"tasks": [{"title": "c", "status": "completed"}]}, headers=headers)
+    client.put(f"/tasks/{first['id']}", json={"status": "in_progress"}, headers=headers)
+
+    expected = {
+        "total": 3,
+        "by_status": {"pending": 1, "in_progress": 1, "completed": 1},
+        "by_category": [{"category_id": None, "count": 2}, {"category_id": category["id"], "count": 1}],
+    }
+    assert client.get("/tasks/stats", headers=headers).json() == expected
+
+    with SessionLocal() as db:
+        rebuild_stats(db, first["user_id"])
+    assert client.get("/tasks/stats", headers=headers).json() == expected
+
+    client.delete(f"/tasks/{first['id']}", headers=headers)
+    stats = client.get("/tasks/stats", headers=headers).json()
+    assert stats["total"] == 2 and "in_progress" not in stats["by_status"]
+
+def test_list_etags_return_304_until_a_mutation():
+    """Test 13: Conditional GETs on listings return 304 until data changes"""
+    headers = auth_headers()
+    client.post("/categories", json={"name": "home"}, headers=headers)
+    first = client.get("/categories", headers=headers)
+    etag = first.headers["ETag"]
+
+    again = client.get("/categories", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    # Different query parameters get a different ETag
+    tasks = client.get("/tasks", headers=headers)
+    filtered = client.get("/tasks", params={"status": "pending"}, headers=headers)
+    assert tasks.headers["ETag"] != filtered.headers["ETag"]
+
+    client.post("/tasks", json={"title": "new"}, headers=headers)
+    changed = client.get("/categories", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+def test_login_upgrades_legacy_sha256_hash():
+    """Test 14: Logging in with a legacy SHA-256 hash rehashes it with bcrypt"""
+    import hashlib
+    from app.database import SessionLocal
+    from app.models import User
+
+    email = f"legacy{random.randint(100000, 999999)}@example.com"
+    with SessionLocal() as db:
+        db.add(User(email=email, hashed_password=hashlib.sha256(b"simple123").hexdigest()))
+        db.commit()
+
+    assert client.post("/login", json={"email": email, "password": "wrong"}).status_code == 401
+    assert client.post("/login", json={"email": email, "password": "simple123"}).status_code == 200
+    with SessionLocal() as db:
+        stored = db.query(User.hashed_password).filter(User.email == email).scalar()
+    assert stored.startswith("$2b$")
+    assert client.post("/login", json={"email": email, "password": "simple123"}).status_code == 200
+
+def test_hashing_pool_rejects_when_saturated():
+    """Test 15: A full hashing pool fails fast with 503 instead of queueing"""
+    import asyncio
+    import pytest
+    from fastapi import HTTPException
+    from app.hashing import HashingPool, hash_password_sync
+
+    pool = HashingPool(workers=1, queue_limit=0)
+    try:
+        assert asyncio.run(pool.run(hash_password_sync, "pw")).startswith("$2b$")
+        pool._slots.acquire()
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(pool.run(hash_password_sync, "pw"))
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "1"
+    finally:
+        pool.shutdown()
+
+def test_profiling_middleware_only_runs_for_signed_requests(tmp_path):
+    """Test 16: A signed X-Profile-Token produces a flamegraph profile and timing split"""
+    import json
+    import time
+    from fastapi import FastAPI
+    from app.profiling import ProfilingMiddleware, sign_profile_token
+
+    profiled_app = FastAPI()
+    profiled_app.include_router(app.router)
+    profiled_app.add_middleware(ProfilingMiddleware, secret="admin", output_dir=str(tmp_path), interval_ms=1)
+    profiled_client = TestClient(profiled_app)
+    headers = auth_headers()
+
+    response = profiled_client.get("/tasks", headers=headers)
+    assert "server-timing" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+    bad = {**headers, "X-Profile-Token": sign_profile_token("wrong", int(time.time()) + 60)}
+    assert "server-timing" not in profiled_client.get("/tasks", headers=bad).headers
+
+    signed = {**headers, "X-Profile-Token": sign_profile_token("admin", int(time.time()) + 60)}
+    response = profiled_client.get("/tasks", headers=signed)
+    assert response.status_code == 200
+    assert "db;dur=" in response.headers["server-timing"]
+
+    summary = json.loads(next(tmp_path.glob("*.json")).read_text())
+    assert summary["request"] == "GET /tasks"
+    assert {"total", "auth", "db", "serialize", "other"} <= set(summary["timings_ms"])
+    assert next(tmp_path.glob("*.folded")).exists()
+
+def test_query_counts_budgets_and_slow_log(monkeypatch, caplog):
+    """Test 17: Requests report their query count and over-budget endpoints fail"""
+    import logging
+    from fastapi import FastAPI
+    from app import instrumentation
+    from app.database import SessionLocal
+    from app.instrumentation import QueryBudgetExceeded, QueryStatsMiddleware, query_budget
+    from app.models import Task
+
+    headers = auth_headers()
+    client.post("/tasks", json={"title": "counted", "description": "secret text"}, headers=headers)
+    response = client.get("/tasks", headers=headers)
+    assert int(response.headers["X-DB-Query-Count"]) <= 3
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
+    assert client.get("/metrics").json()["queries"]["GET list_tasks"]["requests"] >= 1
+
+    for _ in range(3):
+        client.post("/tasks", json={"title": "owned"}, headers=auth_headers())
+
+    n_plus_one_app = FastAPI()
+    n_plus_one_app.add_middleware(QueryStatsMiddleware, enforce_budgets=True)
+
+    @n_plus_one_app.get("/owners")
+    @query_budget(2)
+    def owners():
+        with SessionLocal() as db:
+            tasks = db.query(Task).order_by(Task.id.desc()).limit(3).all()
+            # Lazy-loads one owner per task
+            return [task.owner.email for task in tasks]
+
+    with pytest.raises(QueryBudgetExceeded):
+        TestClient(n_plus_one_app).get("/owners")
+
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    # The logging pipeline detaches "app" from the root logger caplog listens on
+    monkeypatch.setattr(logging.getLogger("app"), "propagate", True)
+    with caplog.at_level("WARNING", logger="app.sql.slow"):
+        client.put(f"/tasks/{response.json()[0]['id']}", json={"description": "hunter2"}, headers=headers)
+    assert "slow query" in caplog.text
+    assert "hunter2" not in caplog.text
+
+def test_structured_logs_carry_request_ids():
+    """Test 18: Log records are queued, JSON-formatted and tagged with the request id"""
+    import json
+    import logging
+    from app.logging_pipeline import JsonFormatter, SamplingFilter, log_pipeline
+
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(JsonFormatter().format(record))
+
+    collector = Collect()
+    log_pipeline.listener.handlers += (collector,)
+    log_pipeline.start()
+    try:
+        response = client.post("/register", json={
+            "email": f"logged{random.randint(100000, 999999)}@example.com",
+            "password": "simple123"
+        }, headers={"X-Request-ID": "req-123"})
+        assert response.headers["X-Request-ID"] == "req-123"
+    finally:
+        log_pipeline.stop()
+        log_pipeline.listener.handlers = tuple(h for h in log_pipeline.listener.handlers if h is not collector)
+
+    entries = [json.loads(line) for line in records]
+    created = next(entry for entry in entries if entry["msg"] == "user created")
+    assert created["request_id"] == "req-123"
+    assert created["logger"] == "app.main"
+    assert isinstance(created["user_id"], int)
+
+    limited = SamplingFilter(sample_rates={"app.noisy": 0.0}, rate_limits={"app.burst": 2})
+    make = lambda name, level=logging.INFO: logging.LogRecord(name, level, "", 0, "msg", None, None)
+    assert not limited.filter(make("app.noisy.child"))
+    assert limited.filter(make("app.noisy", logging.ERROR))
+    assert [limited.filter(make("app.burst")) for _ in range(3)] == [True, True, False]
+
+def test_app_factory_defers_schema_setup(tmp_path, monkeypatch):
+    """Test 19: create_app() leaves the database alone until startup, and migrations run once"""
+    from dataclasses import replace
+    from app import database, migrations
+    from app.config import settings
+    from app.logging_pipeline import log_pipeline
+    from app.main import create_app
+
+    db_file = tmp_path / "factory.db"
+    factory_app = create_app(replace(settings, database_url=f"sqlite:///{db_file}"))
+    assert not db_file.exists()
+
+    with TestClient(factory_app) as factory_client:
+        assert migrations.current_version(factory_app.state.database.engine) == migrations.LATEST_VERSION
+        headers = auth_headers(factory_client)
+        assert factory_client.post("/tasks", json={"title": "fresh"}, headers=headers).status_code == 200
+        # The second app has its own engines; the module-level app is untouched
+        assert app.state.database is database.default
+        assert client.get("/tasks", headers=auth_headers()).json() == []
+
+    def fail(engine):
+        raise AssertionError("schema is current, nothing should run")
+    monkeypatch.setattr(migrations, "MIGRATIONS", [(version, fail) for version, _ in migrations.MIGRATIONS])
+    with TestClient(factory_app) as factory_client:
+        assert factory_client.get("/tasks", headers=headers).json()[0]["title"] == "fresh"
+
+    # Shutting the second app down leaves the shared logging pipeline running
+    assert log_pipeline.started
+
+def test_due_date_ranges_and_due_endpoint():
+    """Test 20: due_before/due_after filter GET /tasks, GET /tasks/due lists upcoming and overdue work, and PUT reschedules"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import text
+    from app.database import read_engine
+
+    headers = auth_headers()
+    now = datetime.utcnow()
+    due = {
+        "overdue": now - timedelta(days=1),
+        "soon": now + timedelta(hours=2),
+        "later": now + timedelta(days=3),
+        "done": now + timedelta(hours=1),
+    }
+    for title, when in due.items():
+        status = "completed" if title == "done" else "pending"
+        client.post("/tasks", json={"title": title, "status": status, "due_date": when.isoformat()}, headers=headers)
+    someday = client.post("/tasks", json={"title": "someday"}, headers=headers).json()["id"]
+
+    response = client.get("/tasks", params={"due_after": now.isoformat(), "due_before": (now + timedelta(days=1)).isoformat()}, headers=headers)
+    assert sorted(task["title"] for task in response.json()) == ["done", "soon"]
+
+    response = client.get("/tasks/due", headers=headers)
+    assert [task["title"] for task in response.json()] == ["overdue", "soon"]
+    response = client.get("/tasks/due", params={"within": "P7D", "overdue": "false", "limit": 1}, headers=headers)
+    assert [task["title"] for task in response.json()] == ["soon"]
+    response = client.get("/tasks/due", params={"within": "P7D", "overdue": "false", "cursor": response.headers["X-Next-Cursor"]}, headers=headers)
+    assert [task["title"] for task in response.json()] == ["later"]
+
+    # Rescheduling through PUT moves a task into the due list
+    client.put(f"/tasks/{someday}", json={"due_date": (now + timedelta(days=2)).isoformat()}, headers=headers)
+    response = client.get("/tasks/due", params={"within": "P7D", "overdue": "false"}, headers=headers)
+    assert [task["title"] for task in response.json()] == ["soon", "someday", "later"]
+
+    with read_engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM tasks WHERE user_id = 1 AND due_date < :now ORDER BY due_date, id"
+        ), {"now": now}).all()
+    assert "ix_tasks_user_due_id" in " ".join(row[-1] for row in plan)
+
+def test_task_events_reach_stream_after_commit():
+    """Test 21: Committed task changes are pushed to the owner's stream; rollbacks and slow readers are not"""
+    import asyncio
+    import json
+    from app.database import SessionLocal
+    from app.events import OVERFLOW, MemoryBroker, event_stream, queue_event
+
+    headers = auth_headers()
+    assert client.get("/tasks/stream").status_code == 403
+    task = client.post("/tasks", json={"title": "watched"}, headers=headers).json()
+
+    async def watch():
+        stream = event_stream(task["user_id"], keepalive=0.05)
+        assert await anext(stream) == "retry: 3000\n\n"
+        await asyncio.to_thread(client.put, f"/tasks/{task['id']}", json={"status": "completed"}, headers=headers)
+        frame = await anext(stream)
+        assert frame.startswith("event: task.updated\n")
+        assert json.loads(frame.split("data: ", 1)[1]) == {"type": "task.updated", "ids": [task["id"]]}
+
+        with SessionLocal() as db:
+            queue_event(db, task["user_id"], "task.deleted", [task["id"]])
+            db.rollback()
+        assert await anext(stream) == ": keepalive\n\n"
+        await stream.aclose()
+
+        small = MemoryBroker(buffer_size=2)
+        subscription = small.subscribe(task["user_id"])
+        for i in range(3):
+            small.publish(task["user_id"], {"type": "task.created", "ids": [i]})
+        await asyncio.sleep(0)
+        assert await subscription.get() is OVERFLOW
+        assert subscription.queue.empty()
+
+    asyncio.run(watch())
+
+def test_delta_sync_reports_changes_and_tombstones():
+    """Test 22: GET /tasks/changes returns only what changed since the token, including deletions"""
+    from datetime import datetime, timedelta
+    from app.sync import encode_token
+
+    headers = auth_headers()
+    ids = [client.post("/tasks", json={"title": f"sync {i}"}, headers=headers).json()["id"] for i in range(3)]
+
+    first = client.get("/tasks/changes", params={"limit": 2}, headers=headers).json()
+    assert first["has_more"] and [task["id"] for task in first["changes"]] == ids[:2]
+    second = client.get("/tasks/changes", params={"since": first["next"]}, headers=headers).json()
+    assert not second["has_more"] and [task["id"] for task in second["changes"]] == ids[2:]
+
+    client.put(f"/tasks/{ids[0]}", json={"status": "completed"}, headers=headers)
+    client.delete(f"/tasks/{ids[1]}", headers=headers)
+    client.request("DELETE", "/tasks/bulk", json={"ids": [ids[2]]}, headers=headers)
+    delta = client.get("/tasks/changes", params={"since": second["next"]}, headers=headers).json()
+    assert [(task["id"], task["status"]) for task in delta["changes"]] == [(ids[0], "completed")]
+    assert delta["deleted"] == ids[1:]
+
+    quiet = client.get("/tasks/changes", params={"since": delta["next"]}, headers=headers).json()
+    assert quiet["changes"] == [] and quiet["deleted"] == []
+
+    stale = encode_token(datetime.utcnow(), 0, datetime.utcnow() - timedelta(days=365))
+    assert client.get("/tasks/changes", params={"since": stale}, headers=headers).status_code == 410
+    assert client.get("/tasks/changes", params={"since": "garbage"}, headers=headers).status_code == 400
+
+def test_sparse_fields_and_compression():
+    """Test 23: fields= narrows the SELECT itself, and large responses are compressed as negotiated"""
+    from sqlalchemy import event
+    from app.compression import negotiate
+    from app.database import read_engine
+
+    headers = auth_headers()
+    task = client.post("/tasks", json={"title": "sparse", "description": "x" * 5000}, headers=headers).json()
+    for i in range(40):
+        client.post("/tasks", json={"title": f"filler task number {i}"}, headers=headers)
+
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(read_engine, "before_cursor_execute", capture)
+    try:
+        response = client.get(f"/tasks/{task['id']}", params={"fields": "id,title"}, headers=headers)
+    finally:
+        event.remove(read_engine, "before_cursor_execute", capture)
+    assert response.json() == {"id": task["id"], "title": "sparse"}
+    assert "description" not in statements[-1]
+    assert list(client.get("/tasks", params={"fields": "title,updated_at"}, headers=headers).json()[0]) == ["title", "updated_at"]
+    assert client.get("/tasks", params={"fields": "title,hashed_password"}, headers=headers).status_code == 400
+
+    response = client.get("/tasks", headers={**headers, "Accept-Encoding": "br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["ETag"].startswith('W/"')
+    assert len(response.json()) == 41
+    response = client.get("/tasks", headers={**headers, "Accept-Encoding": "gzip;q=1, br;q=0"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    response = client.get(f"/tasks/{task['id']}", params={"fields": "id"}, headers={**headers, "Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+    assert negotiate("identity") is None
+    assert negotiate("*") == "br"
+
+def test_group_commit_batches_writes():
+    """Test 24: Queued task writes share one commit, and a failing write only fails its own caller"""
+    from fastapi import HTTPException
+    from app import schemas
+    from app.group_commit import GroupCommitWriter
+    from app.main import insert_task, remove_task
+
+    headers = auth_headers()
+    user_id = client.post("/tasks", json={"title": "owner"}, headers=headers).json()["user_id"]
+    writer = GroupCommitWriter(window_ms=200)
+    try:
+        futures = [writer.submit(insert_task, user_id, schemas.TaskCreate(title=f"grouped {i}")) for i in range(5)]
+        created = [future.result(timeout=5) for future in futures]
+        assert writer.stats()["batches"] == 1 and writer.stats()["largest_batch"] == 5
+        assert len({task["id"] for task in created}) == 5
+
+        futures = [
+            writer.submit(remove_task, user_id, created[0]["id"]),
+            writer.submit(remove_task, user_id, -1),
+            writer.submit(remove_task, user_id, created[1]["id"]),
+        ]
+        assert futures[0].result(timeout=5) == {"message": "Task deleted"}
+        with pytest.raises(HTTPException):
+            futures[1].result(timeout=5)
+        assert futures[2].result(timeout=5) == {"message": "Task deleted"}
+        # The 404 rolled back to its savepoint; the other two shared one commit
+        assert writer.stats()["batches"] == 2 and writer.stats()["failed"] == 1
+    finally:
+        writer.stop()
+
+    titles = [task["title"] for task in client.get("/tasks", headers=headers).json()]
+    assert titles == ["owner", "grouped 2", "grouped 3", "grouped 4"]
+
+def test_board_groups_tasks_in_one_query():
+    """Test 25: GET /board returns capped status groups with full counts for every category"""
+    headers = auth_headers()
+    work = client.post("/categories", json={"name": "Work"}, headers=headers).json()["id"]
+    empty = client.post("/categories", json={"name": "Empty"}, headers=headers).json()["id"]
+    for i in range(3):
+        client.post("/tasks", json={"title": f"work {i}", "category_id": work}, headers=headers)
+    client.post("/tasks", json={"title": "work done", "category_id": work, "status": "completed"}, headers=headers)
+    client.post("/tasks", json={"title": "loose"}, headers=headers)
+
+    response = client.get("/board", params={"per_group": 2}, headers=headers)
+    assert int(response.headers["X-DB-Query-Count"]) <= 3
+    columns = {column["category_id"]: column for column in response.json()["columns"]}
+    assert list(columns) == [work, empty, None]
+    pending = columns[work]["groups"]["pending"]
+    assert pending["count"] == 3 and [task["title"] for task in pending["tasks"]] == ["work 0", "work 1"]
+    assert columns[work]["groups"]["completed"]["count"] == 1
+    assert columns[empty] == {"category_id": empty, "name": "Empty", "groups": {}}
+    assert columns[None]["groups"]["pending"]["tasks"][0]["title"] == "loose"
+
+    etag = response.headers["ETag"]
+    assert client.get("/board", params={"per_group": 2}, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+def test_admission_control(monkeypatch):
+    """Test 26: Admission control rate-limits per JWT subject and sheds saturated routes"""
+    import asyncio
+    from fastapi import FastAPI
+    from jose import jwt
+    from app.admission import AdmissionMetrics, AdmissionMiddleware
+
+    limited = FastAPI()
+
+    @limited.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.3)
+        return {}
+
+    @limited.get("/fast")
+    def fast():
+        return {}
+
+    metrics = AdmissionMetrics()
+    limited.add_middleware(
+        AdmissionMiddleware, router=limited.router, secret="secret", algorithm="HS256",
+        endpoint_limits={"GET /slow": 1}, rate=1, burst=2, max_queue_ms=50, metrics=metrics
+    )
+    token = jwt.encode({"sub": "a@example.com", "exp": 4102444800}, "secret", algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with TestClient(limited) as limited_client:
+        assert limited_client.get("/fast", headers=headers).status_code == 200
+        assert limited_client.get("/fast", headers=headers).status_code == 200
+        response = limited_client.get("/fast", headers=headers)
+        assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+        # A forged token is treated as anonymous, not as the subject it names
+        forged = jwt.encode({"sub": "a@example.com", "exp": 4102444800}, "other", algorithm="HS256")
+        assert limited_client.get("/fast", headers={"Authorization": f"Bearer {forged}"}).status_code == 200
+
+        async def burst():
+            import httpx
+            transport = httpx.ASGITransport(app=limited)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*(async_client.get("/slow") for _ in range(3)))
+
+        statuses = sorted(response.status_code for response in asyncio.run(burst()))
+        assert statuses == [200, 503, 503]
+
+    snapshot = metrics.snapshot()
+    assert snapshot["rate_limited"] == 1 and snapshot["shed"] == 2 and snapshot["in_flight"] == {}
+
+    # Tokens are only decoded when a per-user limit needs the subject, and
+    # not at all once the principal cache has verified them
+    from app import admission
+    from app.principal_cache import Principal, principal_cache
+    decoded = []
+    monkeypatch.setattr(admission, "_decode_token", lambda *args: decoded.append(args) or ("a@example.com", None))
+    unlimited = FastAPI()
+    unlimited.add_api_route("/fast", fast)
+    unlimited.add_middleware(AdmissionMiddleware, router=unlimited.router, secret="secret", algorithm="HS256",
+                             rate=0, user_inflight=0, metrics=AdmissionMetrics())
+    with TestClient(unlimited) as unlimited_client:
+        assert unlimited_client.get("/fast", headers=headers).status_code == 200
+    assert decoded == []
+
+    cached = jwt.encode({"sub": "cached@example.com", "exp": 4102444800}, "secret", algorithm="HS256")
+    principal_cache.set(("secret", cached), Principal(id=1, email="cached@example.com"))
+    hits = principal_cache.stats()["hits"]
+    with TestClient(limited) as limited_client:
+        assert limited_client.get("/fast", headers={"Authorization": f"Bearer {cached}"}).status_code == 200
+    assert decoded == [] and principal_cache.stats()["hits"] == hits
+
+def test_idempotency_keys(tmp_path):
+    """Test 27: A retried write with the same Idempotency-Key replays its stored response"""
+    from dataclasses import replace
+    from app.config import settings
+    from app.main import create_app
+
+    def check(test_client):
+        headers = auth_headers(test_client)
+        keyed = {**headers, "Idempotency-Key": "create-1"}
+        first = test_client.post("/tasks", json={"title": "once"}, headers=keyed)
+        retry = test_client.post("/tasks", json={"title": "once"}, headers=keyed)
+        assert first.status_code == retry.status_code == 200
+        assert retry.json() == first.json() and retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert [task["title"] for task in test_client.get("/tasks", headers=headers).json()] == ["once"]
+
+        reused = test_client.post("/tasks", json={"title": "other"}, headers=keyed)
+        assert reused.status_code == 422
+
+        task_id = first.json()["id"]
+        update = {**headers, "Idempotency-Key": "update-1"}
+        test_client.put(f"/tasks/{task_id}", json={"status": "completed"}, headers=update)
+        assert test_client.put(f"/tasks/{task_id}", json={"status": "completed"}, headers=update).headers["Idempotent-Replayed"] == "true"
+
+        delete = {**headers, "Idempotency-Key": "delete-1"}
+        assert test_client.delete(f"/tasks/{task_id}", headers=delete).status_code == 200
+        # Without the key the retry would be a 404
+        retried = test_client.delete(f"/tasks/{task_id}", headers=delete)
+        assert retried.status_code == 200 and retried.json() == {"message": "Task deleted"}
+
+        category = {**headers, "Idempotency-Key": "category-1"}
+        created = test_client.post("/categories", json={"name": "Home"}, headers=category).json()
+        assert test_client.post("/categories", json={"name": "Home"}, headers=category).json() == created
+        assert len(test_client.get("/categories", headers=headers).json()) == 1
+
+        # Keys are per user
+        other = {**auth_headers(test_client), "Idempotency-Key": "create-1"}
+        mine = test_client.post("/tasks", json={"title": "mine"}, headers=other)
+        assert mine.json()["title"] == "mine" and "Idempotent-Replayed" not in mine.headers
+
+    check(client)
+    async_app = create_app(replace(settings, database_url=f"sqlite:///{tmp_path / 'async.db'}", db_mode="async"))
+    with TestClient(async_app) as async_client:
+        check(async_client)
+
+def test_archive_completed_tasks():
+    """Test 28: Old completed tasks move to the archive, stay readable with include_archived and can be restored"""
+    import json
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from app import database
+    from app.archive import archive_completed
+    from app.models import Task
+
+    headers = auth_headers()
+    ids = [client.post("/tasks", json={"title": f"task {i}"}, headers=headers).json()["id"] for i in range(4)]
+    for task_id in ids[:3]:
+        client.put(f"/tasks/{task_id}", json={"status": "completed"}, headers=headers)
+    with database.SessionLocal() as db:
+        old = datetime.utcnow() - timedelta(days=100)
+        db.execute(update(Task).where(Task.id.in_(ids[:2])).values(updated_at=old))
+        db.commit()
+        etag = client.get("/tasks", headers=headers).headers["ETag"]
+        assert archive_completed(db, older_than_days=90, batch_size=1) >= 2
+
+    assert client.get("/tasks", headers={**headers, "If-None-Match": etag}).status_code == 200
+    assert [task["id"] for task in client.get("/tasks", headers=headers).json()][:2] == ids[2:]
+    assert client.get("/tasks/stats", headers=headers).json()["by_status"] == {"completed": 1, "pending": 1}
+    assert client.get(f"/tasks/{ids[0]}", headers=headers).status_code == 404
+    archived_task = client.get(f"/tasks/{ids[0]}", params={"include_archived": "true"}, headers=headers)
+    assert archived_task.json()["status"] == "completed"
+
+    first = client.get("/tasks", params={"include_archived": "true", "limit": 3}, headers=headers)
+    rest = client.get("/tasks", params={"include_archived": "true", "cursor": first.headers["X-Next-Cursor"]}, headers=headers)
+    assert [task["id"] for task in first.json() + rest.json()][:4] == ids
+
+    exported = client.get("/tasks/export", headers=headers).text.splitlines()
+    assert ids[0] not in [json.loads(line)["id"] for line in exported]
+    exported = client.get("/tasks/export", params={"include_archived": "true"}, headers=headers).text.splitlines()
+    assert [json.loads(line)["id"] for line in exported][:4] == ids
+    csv_export = client.get("/tasks/export", params={"format": "csv", "include_archived": "true", "status": "completed"}, headers=headers)
+    assert len(csv_export.text.splitlines()) == 4
+
+    # With the newest task gone too, a new task still gets an unused id
+    client.delete(f"/tasks/{ids[3]}", headers=headers)
+    created = client.post("/tasks", json={"title": "after archive"}, headers=headers).json()
+    assert created["id"] > ids[3]
+
+    token = client.get("/tasks/changes", headers=headers).json()["next"]
+    assert client.post(f"/tasks/{ids[0]}/unarchive", headers=headers).status_code == 200
+    assert client.post(f"/tasks/{ids[0]}/unarchive", headers=headers).status_code == 404
+    assert client.get(f"/tasks/{ids[0]}", headers=headers).json()["title"] == "task 0"
+    assert client.get("/tasks/stats", headers=headers).json()["by_status"] == {"completed": 2, "pending": 1}
+    # A restored task counts as just updated: clients synced while it was
+    # archived see it again, and the next archiver pass leaves it alone
+    changes = client.get("/tasks/changes", params={"since": token}, headers=headers).json()
+    assert [task["id"] for task in changes["changes"]] == [ids[0]]
+    with database.SessionLocal() as db:
+        archive_completed(db, older_than_days=90)
+    assert client.get(f"/tasks/{ids[0]}", headers=headers).status_code == 200
+
+BASELINE_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, created_at DATETIME)",
+    "CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, user_id INTEGER NOT NULL REFERENCES users (id), created_at DATETIME)",
+    "CREATE TABLE tasks (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, description TEXT, status VARCHAR, due_date DATETIME, "
+    "user_id INTEGER NOT NULL REFERENCES users (id), category_id INTEGER REFERENCES categories (id), created_at DATETIME, updated_at DATETIME)",
+    "CREATE INDEX ix_tasks_id ON tasks (id)",
+]
+
+def test_migrations_index_baseline_databases(tmp_path):
+    """Test 29: Migrating a database created before this series builds the pagination indexes and stops id reuse"""
+    from sqlalchemy import create_engine, inspect, text
+    from app.migrations import migrate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+    migrate(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("tasks")}
+    assert {"ix_tasks_user_created_id", "ix_tasks_user_status_created_id", "ix_tasks_user_category_created_id"} <= names
+    with engine.connect() as conn:
+        plan = " ".join(row[3] for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM tasks WHERE user_id = 1 AND status = 'completed' "
+            "ORDER BY created_at, id LIMIT 101"
+        )))
+    assert "ix_tasks_user_status_created_id" in plan and "TEMP B-TREE" not in plan
+
+    # tasks was rebuilt with AUTOINCREMENT, keeping rows and the search index
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'a@example.com', 'x')"))
+        conn.execute(text("INSERT INTO tasks (title, user_id) VALUES ('baseline', 1)"))
+        conn.execute(text("DELETE FROM tasks"))
+        conn.execute(text("INSERT INTO tasks (title, user_id) VALUES ('baseline', 1)"))
+        assert conn.execute(text("SELECT id FROM tasks")).scalar() == 2
+        assert conn.execute(text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'baseline'")).scalar() == 2
+    engine.dispose()
+
+def test_bulk_writes_follow_commit_order():
+    """Test 30: Bulk writes are committed by the group-commit writer and reach /tasks/changes"""
+    from app.group_commit import group_commit
+
+    headers = auth_headers()
+    created = client.post("/tasks/bulk", json={"tasks": [{"title": "a"}, {"title": "b"}]}, headers=headers).json()
+    ids = [result["id"] for result in created["results"]]
+    token = client.get("/tasks/changes", headers=headers).json()["next"]
+
+    writes = group_commit.writes
+    updated = client.patch("/tasks/bulk", json={"tasks": [{"id": ids[0], "status": "completed"}, {"id": 0}]}, headers=headers)
+    assert updated.json()["updated"] == 1 and group_commit.writes == writes + 1
+    assert client.request("DELETE", "/tasks/bulk", json={"ids": [ids[1]]}, headers=headers).json()["deleted"] == 1
+
+    changes = client.get("/tasks/changes", params={"since": token}, headers=headers).json()
+    assert [task["id"] for task in changes["changes"]] == [ids[0]] and changes["deleted"] == [ids[1]]
+
+def test_group_commit_writes_beside_other_writers():
+    """Test 31: A group-commit write that reads before it writes survives another connection committing meanwhile"""
+    import threading
+    from sqlalchemy import func, insert, select
+    from app import database
+    from app.group_commit import GroupCommitWriter
+    from app.models import Task
+
+    headers = auth_headers()
+    user_id = client.post("/tasks", json={"title": "owner"}, headers=headers).json()["user_id"]
+
+    def other_writer():
+        with database.SessionLocal() as db:
+            db.execute(insert(Task).values(title="other", user_id=user_id))
+            db.commit()
+
+    def read_then_write(db, user_id):
+        count = db.execute(select(func.count()).select_from(Task).where(Task.user_id == user_id)).scalar()
+        # Another connection tries to commit between this read and the insert
+        other = threading.Thread(target=other_writer)
+        other.start()
+        other.join(0.3)
+        db.execute(insert(Task).values(title=f"after {count}", user_id=user_id))
+        return other
+
+    writer = GroupCommitWriter()
+    try:
+        other = writer.submit(read_then_write, user_id).result(timeout=10)
+        other.join(timeout=10)
+    finally:
+        writer.stop()
+    assert sorted(task["title"] for task in client.get("/tasks", headers=headers).json()) == ["after 1", "other", "owner"]
+
+def test_group_commit_skips_cancelled_writes():
+    """Test 32: A write whose caller is cancelled while it is queued is skipped, and the writer keeps running"""
+    import asyncio
+    import threading
+    from app import schemas
+    from app.group_commit import GroupCommitWriter
+    from app.main import insert_task
+
+    headers = auth_headers()
+    user_id = client.post("/tasks", json={"title": "owner"}, headers=headers).json()["user_id"]
+    release = threading.Event()
+    writer = GroupCommitWriter(max_batch=1)
+
+    async def scenario():
+        writer.submit(lambda db: release.wait(5))
+        cancelled = asyncio.create_task(writer.run(insert_task, user_id, schemas.TaskCreate(title="cancelled")))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        release.set()
+        return await asyncio.wait_for(writer.run(insert_task, user_id, schemas.TaskCreate(title="after")), 5)
+
+    try:
+        assert asyncio.run(scenario())["title"] == "after"
+    finally:
+        writer.stop()
+    assert [task["title"] for task in client.get("/tasks", headers=headers).json()] == ["owner", "after"]